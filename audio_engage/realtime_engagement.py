@@ -1,26 +1,64 @@
-import pyaudio
 import wave
 import numpy as np
 import os
 import time
 import threading
-import queue
 import librosa
+from scipy import signal
 import joblib
 from datetime import datetime
 import warnings
 
+# Capture backend: sounddevice delivers float32 samples directly, PyAudio
+# (int16 bytes) is the fallback
+try:
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):
+    SOUNDDEVICE_AVAILABLE = False
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
 # Constants
 CHUNK_SIZE = 4096  # Number of frames per buffer
-FORMAT = pyaudio.paInt16  # Audio format
+FORMAT = pyaudio.paInt16 if PYAUDIO_AVAILABLE else None  # PyAudio sample format
 CHANNELS = 1  # Mono
 RATE = 16000  # Sample rate in Hz
 WINDOW_DURATION = 3  # Duration of each analysis window in seconds
 WINDOW_SIZE = int(RATE * WINDOW_DURATION)  # Window size in samples
+# Rate features are computed at. Windows are decimated from RATE when this
+# is lower; 8000 roughly halves the STFT/MFCC/chroma cost, but only suits a
+# model trained on 8 kHz features (the shipped model was trained at 16 kHz)
+FEATURE_RATE = RATE
+FEATURE_DECIMATION = RATE // FEATURE_RATE
+FEATURE_WINDOW_SIZE = WINDOW_SIZE // FEATURE_DECIMATION  # Window size after decimation
 MODEL_PATH = 'emotion_detection_model.joblib'  # Path to the model
+N_MFCC = 13  # MFCC coefficients
+N_CHROMA = 12  # Chroma bins
+N_MEL_FEATURES = 20  # Leading mel bands kept as features
+N_FEATURES = N_MFCC + N_CHROMA + N_MEL_FEATURES
+N_FFT = 2048  # librosa's default STFT frame length (as used in training)
+HOP_LENGTH = N_FFT // 4  # librosa's default hop
+N_FRAMES = 1 + FEATURE_WINDOW_SIZE // HOP_LENGTH  # STFT frames per centered window
+# Periodic Hann window, identical to librosa.filters.get_window('hann', N_FFT)
+STFT_WINDOW = 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(N_FFT) / N_FFT)
+INT16_SCALE = np.float32(1.0 / 32768.0)  # int16 PCM -> [-1, 1) float
+BATCH_SIZE = 8  # Max windows classified per model call
+# Window buffers shared by the callback and the analysis thread (power of
+# two). A ring of N slots holds at most N - 1 windows, so it must be larger
+# than BATCH_SIZE for a full batch to end the wait early
+RING_SLOTS = 16
+RING_MASK = RING_SLOTS - 1
+BATCH_MAX_WAIT = 0.05  # Seconds to wait for more windows once one has arrived
+SILENCE_RMS = 1e-3  # Windows quieter than this skip feature extraction
+NO_AUDIO_RESULT = ("Engaged", "no_audio")  # Reported for silent windows
 
 # Engagement mapping for binary output
 ENGAGED_EMOTIONS = {'neutral', 'happy', 'surprised'}  # adjust as needed
@@ -41,32 +79,75 @@ class AudioProcessor:
         self.scaler = self.model_data['scaler']
         print("Model loaded successfully")
         
-        self.audio_buffer = np.zeros(WINDOW_SIZE, dtype=np.float32)
+        # Single-producer/single-consumer ring of window buffers. The
+        # callback fills _slots[_head] and publishes it by advancing _head;
+        # the analysis thread reads _slots[_tail:_head] and returns them by
+        # advancing _tail. Each index is written by one side only, so no
+        # lock is needed; _window_ready only wakes the analysis thread.
+        self._slots = [np.empty(WINDOW_SIZE, dtype=np.float32) for _ in range(RING_SLOTS)]
+        self._head = 0
+        self._tail = 0
+        self._window_ready = threading.Event()
+        self.audio_buffer = self._slots[0]
         self.buffer_index = 0
         self.is_recording = False
-        self.audio_queue = queue.Queue()
+        
+        # STFT scratch: zero-padded window and windowed frames, reused by
+        # the analysis thread for every window
+        self._stft_pad = np.zeros(FEATURE_WINDOW_SIZE + N_FFT, dtype=np.float32)
+        self._stft_frames = np.empty((N_FRAMES, N_FFT), dtype=np.float64)
+        
+    def power_spectrogram(self, y):
+        """Power spectrogram of one window, equal to np.abs(librosa.stft(y)) ** 2
+        
+        The Hann window and padding buffer are precomputed and the frames are
+        a strided view, so no per-call window or frame setup is needed.
+        """
+        pad = N_FFT // 2
+        n = len(y)
+        if n + 2 * pad > len(self._stft_pad):
+            # Longer than a feature window: grow the scratch buffers to fit
+            self._stft_pad = np.zeros(n + 2 * pad, dtype=np.float32)
+            self._stft_frames = np.empty((1 + n // HOP_LENGTH, N_FFT), dtype=np.float64)
+        # Zero padding on both sides, as librosa's center=True default does;
+        # the tail is rewritten every call so a shorter window never sees
+        # samples left over from a longer one
+        self._stft_pad[pad:pad + n] = y
+        self._stft_pad[pad + n:n + 2 * pad] = 0.0
+        frames = np.lib.stride_tricks.sliding_window_view(self._stft_pad[:n + 2 * pad], N_FFT)[::HOP_LENGTH]
+        windowed = self._stft_frames[:len(frames)]
+        np.multiply(frames, STFT_WINDOW, out=windowed)
+        spectrum = np.fft.rfft(windowed, axis=1).astype(np.complex64)
+        return (np.abs(spectrum) ** 2).T
         
     def extract_features(self, audio_data):
         """Extract audio features from numpy array"""
         try:
-            y = audio_data.astype(np.float32)
-            # Debug: print shape and stats
-            print(f"[DEBUG] Input audio shape: {y.shape}, min: {y.min()}, max: {y.max()}, mean: {y.mean()}")
-            # If the audio is silent (all zeros or near zero), return a special flag
-            if np.allclose(y, 0, atol=1e-4):
-                print("[DEBUG] No audio detected (silent input)")
+            y = np.asarray(audio_data, dtype=np.float32)
+            # RMS energy gate: silent windows skip the STFT entirely and
+            # return a special flag
+            rms = float(np.sqrt(np.dot(y, y) / y.size))
+            if rms < SILENCE_RMS:
+                print(f"[DEBUG] No audio detected (silent input, rms: {rms:.2e})")
                 return 'NO_AUDIO'
+            # Debug: print shape and stats
+            print(f"[DEBUG] Input audio shape: {y.shape}, min: {y.min()}, max: {y.max()}, mean: {y.mean()}, rms: {rms}")
+            # Anti-aliased downsampling to FEATURE_RATE (a no-op at 16 kHz)
+            if FEATURE_DECIMATION > 1:
+                y = signal.decimate(y, FEATURE_DECIMATION, ftype='iir', zero_phase=True).astype(np.float32)
+            # One power spectrogram shared by every feature below (librosa's
+            # default STFT parameters, so the features EXACTLY match training)
+            S = self.power_spectrogram(y)
+            mel = librosa.feature.melspectrogram(S=S, sr=FEATURE_RATE)
+            features = np.empty(N_FEATURES, dtype=np.float32)
             # Extract MFCCs
-            mfccs = librosa.feature.mfcc(y=y, sr=RATE, n_mfcc=13)
-            mfccs_mean = np.mean(mfccs, axis=1)
+            mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+            np.mean(mfccs, axis=1, out=features[:N_MFCC])
             # Extract Chroma
-            chroma = librosa.feature.chroma_stft(y=y, sr=RATE)
-            chroma_mean = np.mean(chroma, axis=1)
-            # Extract Mel spectrogram
-            mel = librosa.feature.melspectrogram(y=y, sr=RATE)
-            mel_mean = np.mean(mel, axis=1)[:20]  # First 20 features
-            # Combine features - EXACTLY matching the training features
-            features = np.concatenate((mfccs_mean, chroma_mean, mel_mean))
+            chroma = librosa.feature.chroma_stft(S=S, sr=FEATURE_RATE, n_chroma=N_CHROMA)
+            np.mean(chroma, axis=1, out=features[N_MFCC:N_MFCC + N_CHROMA])
+            # Mel spectrogram, first 20 bands
+            np.mean(mel[:N_MEL_FEATURES], axis=1, out=features[N_MFCC + N_CHROMA:])
             print(f"[DEBUG] Feature vector shape: {features.shape}, values: {features[:5]} ...")
             return features
         except Exception as e:
@@ -75,102 +156,172 @@ class AudioProcessor:
 
     def predict_engagement(self, audio_data):
         """Predict engagement from audio data"""
-        features = self.extract_features(audio_data)
-        if isinstance(features, str) and features == 'NO_AUDIO':
-            return "Engaged", "no_audio"
-        if features is None:
-            return "Error processing audio", "error"
-        # Scale features
-        features = features.reshape(1, -1)
-        if features.shape[1] != self.scaler.mean_.shape[0]:
-            print(f"[ERROR] Feature shape mismatch: got {features.shape[1]}, expected {self.scaler.mean_.shape[0]}")
-            return "Feature shape mismatch", "error"
-        features = self.scaler.transform(features)
-        # Make prediction
-        prediction = self.model.predict(features)[0]
-        print(f"[DEBUG] Raw model prediction: {prediction}")
-        # Map to binary engagement status
-        engagement = map_to_engagement(prediction)
-        return engagement, prediction
+        return self.predict_engagement_batch([audio_data])[0]
+    
+    def predict_engagement_batch(self, windows):
+        """Predict engagement for several audio windows with one model call
+        
+        Returns one (engagement, emotion) pair per window, in order.
+        """
+        results = [None] * len(windows)
+        rows = []
+        row_index = []
+        for i, audio_data in enumerate(windows):
+            features = self.extract_features(audio_data)
+            if isinstance(features, str) and features == 'NO_AUDIO':
+                results[i] = NO_AUDIO_RESULT
+            elif features is None:
+                results[i] = ("Error processing audio", "error")
+            elif features.shape[0] != self.scaler.mean_.shape[0]:
+                print(f"[ERROR] Feature shape mismatch: got {features.shape[0]}, expected {self.scaler.mean_.shape[0]}")
+                results[i] = ("Feature shape mismatch", "error")
+            else:
+                rows.append(features)
+                row_index.append(i)
+        
+        if rows:
+            # Scale features and predict for all windows at once
+            features = self.scaler.transform(np.stack(rows))
+            predictions = self.model.predict(features)
+            for i, prediction in zip(row_index, predictions):
+                print(f"[DEBUG] Raw model prediction: {prediction}")
+                # Map to binary engagement status
+                results[i] = (map_to_engagement(prediction), prediction)
+        return results
+        
+    @staticmethod
+    def _copy_samples(src, dst):
+        """Copy captured samples into dst, normalizing int16 PCM on the way"""
+        if src.dtype == np.int16:
+            np.multiply(src, INT16_SCALE, out=dst, casting='unsafe')
+        else:
+            np.copyto(dst, src)
+    
+    def _pending_windows(self):
+        """Number of full windows published by the callback and not yet consumed"""
+        return (self._head - self._tail) & RING_MASK
+    
+    def _publish_window(self):
+        """Hand the full window in _slots[_head] to the analysis thread
         
+        When the ring is full the window is dropped and its slot refilled.
+        """
+        nxt = (self._head + 1) & RING_MASK
+        if nxt != self._tail:
+            self._head = nxt
+            self.audio_buffer = self._slots[nxt]
+            self._window_ready.set()
+    
+    def _fill_buffer(self, audio_data):
+        """Append captured samples to the current window buffer, publishing it when full"""
+        frame_count = len(audio_data)
+        
+        # Samples go straight into the window buffer: one vectorized pass
+        # with no temporaries
+        remaining = WINDOW_SIZE - self.buffer_index
+        if remaining <= frame_count:
+            # Fill buffer and process
+            self._copy_samples(audio_data[:remaining], self.audio_buffer[self.buffer_index:])
+            
+            # Move on to the next slot and fill with remaining data
+            self._publish_window()
+            self.buffer_index = 0
+            excess = frame_count - remaining
+            if excess > 0:
+                self._copy_samples(audio_data[remaining:], self.audio_buffer[:excess])
+                self.buffer_index = excess
+        else:
+            # Just add to buffer
+            self._copy_samples(audio_data, self.audio_buffer[self.buffer_index:self.buffer_index+frame_count])
+            self.buffer_index += frame_count
+    
     def audio_callback(self, in_data, frame_count, time_info, status):
         """Callback function for PyAudio"""
         if self.is_recording:
-            # Convert byte data to numpy array
-            audio_data = np.frombuffer(in_data, dtype=np.int16)
-            
-            # Normalize
-            audio_float = audio_data.astype(np.float32) / 32768.0
-            
-            # Add to buffer
-            remaining = WINDOW_SIZE - self.buffer_index
-            if remaining <= frame_count:
-                # Fill buffer and process
-                self.audio_buffer[self.buffer_index:] = audio_float[:remaining]
-                self.audio_queue.put(np.copy(self.audio_buffer))
-                
-                # Reset buffer and fill with remaining data
-                self.buffer_index = 0
-                excess = frame_count - remaining
-                if excess > 0:
-                    self.audio_buffer[:excess] = audio_float[remaining:]
-                    self.buffer_index = excess
-            else:
-                # Just add to buffer
-                self.audio_buffer[self.buffer_index:self.buffer_index+frame_count] = audio_float
-                self.buffer_index += frame_count
+            # Convert byte data to numpy array (a view, no copy)
+            self._fill_buffer(np.frombuffer(in_data, dtype=np.int16))
         
         # Always return empty data and continue flag
         return (b'', pyaudio.paContinue)
     
+    def _sd_callback(self, indata, frames, time_info, status):
+        """Callback function for sounddevice (indata is already float32)"""
+        if self.is_recording:
+            self._fill_buffer(indata[:, 0])
+    
     def analysis_thread(self):
         """Thread for processing audio data"""
         while self.is_recording:
             try:
-                # Get audio data from queue with timeout
-                audio_data = self.audio_queue.get(timeout=1.0)
+                # Wait for a full window with timeout, then for any backlog
+                # that arrives within BATCH_MAX_WAIT
+                self._window_ready.clear()
+                if self._pending_windows() == 0 and not self._window_ready.wait(timeout=1.0):
+                    continue
+                deadline = time.monotonic() + BATCH_MAX_WAIT
+                while self._pending_windows() < BATCH_SIZE:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._window_ready.clear()
+                    self._window_ready.wait(timeout=wait)
                 
-                # Process audio data
-                engagement_status, emotion = self.predict_engagement(audio_data)
+                # Process audio data, then hand the slots back to the callback
+                n = min(self._pending_windows(), BATCH_SIZE)
+                windows = [self._slots[(self._tail + i) & RING_MASK] for i in range(n)]
+                try:
+                    results = self.predict_engagement_batch(windows)
+                finally:
+                    self._tail = (self._tail + n) & RING_MASK
                 
                 # Get current time
                 current_time = datetime.now().strftime("%H:%M:%S")
                 
-                # Print status with color based on engagement
-                if engagement_status == "Engaged":
-                    status_color = "\033[92m"  # Green
-                elif engagement_status == "Not Fully Engaged":
-                    status_color = "\033[93m"  # Yellow
-                else:
-                    status_color = "\033[91m"  # Red
+                for engagement_status, emotion in results:
+                    # Print status with color based on engagement
+                    if engagement_status == "Engaged":
+                        status_color = "\033[92m"  # Green
+                    elif engagement_status == "Not Fully Engaged":
+                        status_color = "\033[93m"  # Yellow
+                    else:
+                        status_color = "\033[91m"  # Red
+                        
+                    reset_color = "\033[0m"  # Reset color
                     
-                reset_color = "\033[0m"  # Reset color
-                
-                print(f"{current_time} - {status_color}{engagement_status}{reset_color} (Emotion: {emotion})")
+                    print(f"{current_time} - {status_color}{engagement_status}{reset_color} (Emotion: {emotion})")
                 
-                # Mark task as done
-                self.audio_queue.task_done()
-                
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"Error in analysis thread: {e}")
     
     def start_monitoring(self):
         """Start monitoring audio"""
         print("Initializing audio stream...")
-        self.p = pyaudio.PyAudio()
-        
-        # Open stream
-        self.stream = self.p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RATE,
-            input=True,
-            output=False,
-            frames_per_buffer=CHUNK_SIZE,
-            stream_callback=self.audio_callback
-        )
+        if SOUNDDEVICE_AVAILABLE:
+            # Open a float32 stream; the callback gets samples as an ndarray
+            self.stream = sd.InputStream(
+                samplerate=RATE,
+                channels=CHANNELS,
+                dtype='float32',
+                blocksize=CHUNK_SIZE,
+                callback=self._sd_callback
+            )
+            self.stream.start()
+        elif PYAUDIO_AVAILABLE:
+            self.p = pyaudio.PyAudio()
+            
+            # Open stream
+            self.stream = self.p.open(
+                format=FORMAT,
+                channels=CHANNELS,
+                rate=RATE,
+                input=True,
+                output=False,
+                frames_per_buffer=CHUNK_SIZE,
+                stream_callback=self.audio_callback
+            )
+        else:
+            print("No audio backend available: install sounddevice or pyaudio")
+            return
         
         self.is_recording = True
         
@@ -202,7 +353,10 @@ class AudioProcessor:
         
         # Stop and close the audio stream
         if hasattr(self, 'stream'):
-            self.stream.stop_stream()
+            if SOUNDDEVICE_AVAILABLE:
+                self.stream.stop()
+            else:
+                self.stream.stop_stream()
             self.stream.close()
         
         # Terminate PyAudio
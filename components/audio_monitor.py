@@ -1,17 +1,316 @@
 import streamlit as st
 import numpy as np
 import time
+import os
+import threading
+import queue
+import hashlib
+import logging
+import tempfile
 from pathlib import Path
 
-# Check for audio dependencies
+logger = logging.getLogger(__name__)
+
+# Check for audio dependencies (librosa and joblib are heavy to import and
+# only needed later, so they are not imported here)
 try:
     import pyaudio
-    import librosa
-    import joblib
     AUDIO_AVAILABLE = True
 except ImportError:
     AUDIO_AVAILABLE = False
 
+# Optional ONNX Runtime backend for the classifier
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Client-side refresh timer, so the script isn't kept busy between updates
+try:
+    from streamlit_autorefresh import st_autorefresh
+    AUTOREFRESH_AVAILABLE = True
+except ImportError:
+    AUTOREFRESH_AVAILABLE = False
+
+# Optional JIT compiler for the feature extraction hot path
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional SIMD RMS kernel for the NumPy fallback path
+try:
+    import numpy_rms
+    NUMPY_RMS_AVAILABLE = True
+except ImportError:
+    NUMPY_RMS_AVAILABLE = False
+
+def _fused_stats_py(x, out):
+    """Write mean, std, max, min, median, var, ZCR and RMS of a window to out[:8].
+
+    The median slot (index 4) is left for the caller, since it needs a
+    selection pass rather than a streaming one.
+    """
+    out[0] = np.mean(x)
+    out[1] = np.std(x)
+    out[2] = np.max(x)
+    out[3] = np.min(x)
+    out[4] = 0.0
+    out[5] = np.var(x)
+    
+    # Zero crossing rate, counted without building an index array
+    sb = np.signbit(x)
+    out[6] = np.count_nonzero(sb[1:] != sb[:-1]) / len(x)
+    
+    # RMS energy (numpy_rms needs a contiguous float32 array for its SIMD path)
+    if NUMPY_RMS_AVAILABLE and x.dtype == np.float32 and x.flags.c_contiguous:
+        out[7] = float(numpy_rms.rms(x)[0])
+    else:
+        out[7] = np.sqrt(np.mean(x**2))
+
+def _spectral_stats_py(mag, freqs, out):
+    """Write mean spectral centroid, mean 85% rolloff and mean flux of a
+    magnitude spectrogram of shape (n_frames, n_bins) to out[:3]"""
+    n_frames = mag.shape[0]
+    
+    # Centroid and 85% rolloff per frame, averaged over the window
+    frame_sum = mag.sum(axis=1) + 1e-10
+    centroid = (mag @ freqs) / frame_sum
+    cumsum = np.cumsum(mag, axis=1)
+    rolloff_bin = np.count_nonzero(cumsum < 0.85 * cumsum[:, -1:], axis=1)
+    rolloff = freqs[np.minimum(rolloff_bin, len(freqs) - 1)]
+    
+    # Spectral flux between consecutive frames
+    flux = np.sqrt(np.square(np.diff(mag, axis=0)).sum(axis=1)).mean() if n_frames > 1 else 0.0
+    
+    out[0] = centroid.mean()
+    out[1] = rolloff.mean()
+    out[2] = flux
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _fused_stats(x, out):
+        """Single-pass version of _fused_stats_py (Welford mean/var, branchless ZCR)"""
+        n = x.shape[0]
+        m1 = 0.0
+        m2 = 0.0
+        sum_sq = 0.0
+        x_max = x[0]
+        x_min = x[0]
+        zcr_count = 0
+        prev_pos = x[0] >= 0
+        for i in range(n):
+            v = x[i]
+            if v > x_max:
+                x_max = v
+            if v < x_min:
+                x_min = v
+            delta = v - m1
+            m1 += delta / (i + 1)
+            m2 += delta * (v - m1)
+            sum_sq += v * v
+            pos = v >= 0
+            zcr_count += prev_pos ^ pos
+            prev_pos = pos
+        var = m2 / n
+        out[0] = m1
+        out[1] = np.sqrt(var)
+        out[2] = x_max
+        out[3] = x_min
+        out[4] = 0.0
+        out[5] = var
+        out[6] = zcr_count / n
+        out[7] = np.sqrt(sum_sq / n)
+
+    @njit(cache=True, nogil=True)
+    def _update_crossings(samples, bits, head, mask, span, last_pos, count):
+        """Track zero crossings of the last `span` sample pairs as samples arrive
+        
+        `bits` is a packed bitset over ring positions recording whether the
+        sample at that position crossed zero, so samples ageing out of the
+        window are subtracted with a single lookup.
+        """
+        for i in range(samples.shape[0]):
+            p = head + i
+            pos = samples[i] >= 0
+            crossed = np.uint8(pos ^ last_pos)
+            idx = p & mask
+            bits[idx >> 3] = (bits[idx >> 3] & ~(1 << (idx & 7))) | (crossed << (idx & 7))
+            count += crossed
+            
+            old = p - span
+            if old >= 0:
+                old_idx = old & mask
+                count -= (bits[old_idx >> 3] >> (old_idx & 7)) & 1
+            last_pos = pos
+        return count, last_pos
+
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _spectral_stats(mag, freqs, out):
+        """Fused per-frame version of _spectral_stats_py, no temporaries"""
+        n_frames, n_bins = mag.shape
+        centroid_sum = 0.0
+        rolloff_sum = 0.0
+        flux_sum = 0.0
+        for t in range(n_frames):
+            total = 0.0
+            weighted = 0.0
+            for k in range(n_bins):
+                m = mag[t, k]
+                total += m
+                weighted += freqs[k] * m
+            centroid_sum += weighted / (total + 1e-10)
+            
+            # First bin whose cumulative magnitude reaches 85% of the total
+            threshold = 0.85 * total
+            cum = 0.0
+            b = 0
+            while b < n_bins - 1:
+                cum += mag[t, b]
+                if cum >= threshold:
+                    break
+                b += 1
+            rolloff_sum += freqs[b]
+            
+            if t > 0:
+                d = 0.0
+                for k in range(n_bins):
+                    diff = mag[t, k] - mag[t - 1, k]
+                    d += diff * diff
+                flux_sum += np.sqrt(d)
+        out[0] = centroid_sum / n_frames
+        out[1] = rolloff_sum / n_frames
+        out[2] = flux_sum / (n_frames - 1) if n_frames > 1 else 0.0
+
+    # Compile at import time so the first real window doesn't pay for it
+    _fused_stats(np.zeros(1, dtype=np.float32), np.empty(8, dtype=np.float32))
+    _update_crossings(np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.uint8), 0, 7, 1, True, 0)
+    for _dtype in (np.float32, np.float64):
+        _spectral_stats(np.zeros((1, 2), dtype=_dtype), np.zeros(2, dtype=np.float32), np.empty(3, dtype=np.float32))
+else:
+    _fused_stats = _fused_stats_py
+    _spectral_stats = _spectral_stats_py
+
+def _mel_filterbank(sr, n_fft, n_mels):
+    """Triangular mel filterbank of shape (n_mels, n_fft // 2 + 1)"""
+    def hz_to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+    
+    def mel_to_hz(m):
+        return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+    
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2.0), n_mels + 2)
+    hz_points = mel_to_hz(mel_points)
+    
+    fb = np.zeros((n_mels, len(fft_freqs)), dtype=np.float32)
+    for m in range(n_mels):
+        left, center, right = hz_points[m:m + 3]
+        rising = (fft_freqs - left) / (center - left)
+        falling = (right - fft_freqs) / (right - center)
+        fb[m] = np.maximum(0.0, np.minimum(rising, falling))
+    return fb
+
+def _dct_matrix(n_out, n_in):
+    """Orthonormal DCT-II matrix of shape (n_out, n_in)"""
+    k = np.arange(n_out)[:, None]
+    n = np.arange(n_in)[None, :]
+    dct = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    dct[0] /= np.sqrt(2.0)
+    return dct.astype(np.float32)
+
+def _median(x):
+    """O(n) median via partial sort (matches np.median for even lengths)"""
+    n = x.shape[0]
+    k = n // 2
+    if n % 2:
+        return np.partition(x, k)[k]
+    part = np.partition(x, (k - 1, k))
+    return 0.5 * (part[k - 1] + part[k])
+
+def _elevate_current_thread():
+    """Give the calling thread round-robin real-time priority
+    
+    Only works on Linux with CAP_SYS_NICE (or a suitable rtprio limit);
+    elsewhere the thread keeps its normal priority.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_RR, os.sched_param(50))
+        return True
+    except (AttributeError, OSError):
+        return False
+
+# Per-session emotion history, kept as a fixed ring of records
+AUDIO_HISTORY_LEN = 50
+AUDIO_HISTORY_DTYPE = [('t', 'f8'), ('conf', 'f4'), ('emotion_id', 'i1')]
+
+@st.cache_resource(max_entries=4)
+def _load_model(path, mtime):
+    """Load (model, scaler) once per process and share it across sessions
+    
+    `mtime` is only part of the cache key, so a retrained model file is
+    picked up without restarting the app.
+    """
+    import joblib
+    
+    model_data = joblib.load(path)
+    return model_data['model'], model_data['scaler']
+
+def _onnx_cache_path(path):
+    """Where the converted copy of the joblib model at `path` is cached
+    
+    Kept under the user cache directory (or the temp directory if that
+    isn't writable) rather than next to the model, so read-only installs
+    work and the source tree stays clean.
+    """
+    path = Path(path).resolve()
+    tag = hashlib.sha1(str(path).encode()).hexdigest()[:12]
+    cache_home = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    for cache_dir in (cache_home / 'engagement-monitor', Path(tempfile.gettempdir()) / 'engagement-monitor'):
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(cache_dir, os.W_OK):
+            return cache_dir / f"{path.stem}-{tag}.onnx"
+    return None
+
+@st.cache_resource(max_entries=4)
+def _load_onnx_session(path, mtime):
+    """ONNX Runtime session for the classifier stored in the joblib file at `path`
+    
+    Uses the cached .onnx conversion when it is at least as new as the
+    joblib file, otherwise converts the classifier with skl2onnx and
+    caches the result. Returns None when that isn't possible.
+    """
+    onnx_path = _onnx_cache_path(path)
+    if onnx_path is None:
+        logger.warning("ONNX Runtime not used for %s: no writable cache directory", path)
+        return None
+    try:
+        if not onnx_path.exists() or onnx_path.stat().st_mtime < mtime:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+            
+            model, _ = _load_model(path, mtime)
+            onx = convert_sklearn(
+                model,
+                initial_types=[('input', FloatTensorType([None, model.n_features_in_]))],
+                options={id(model): {'zipmap': False}}
+            )
+            onnx_path.write_bytes(onx.SerializeToString())
+        
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+                     if p in ort.get_available_providers()]
+        return ort.InferenceSession(str(onnx_path), sess_options=so, providers=providers)
+    except Exception as e:
+        logger.warning("ONNX Runtime not used for %s: %s", path, e)
+        return None
+
 class StreamlitAudioProcessor:
     """Audio processor adapted for Streamlit"""
     
@@ -24,26 +323,88 @@ class StreamlitAudioProcessor:
             model_path = Path(__file__).parent.parent / "audio_engage" / "emotion_detection_model.joblib"
         
         self.model_path = model_path
-        self.model_data = None
         self.model = None
         self.scaler = None
+        self._classes_lower = None
+        self._engaged_mask = None
+        self._class_ids = {}
+        self._scale_mean = None
+        self._scale_inv = None
+        self._onnx_session = None
+        self._has_proba = False
+        self._proba_fn = None
+        # False when the model expects a different feature layout
+        self._features_match = True
         
         # Audio parameters
         self.CHUNK_SIZE = 4096
         self.FORMAT = pyaudio.paInt16 if AUDIO_AVAILABLE else None
         self.CHANNELS = 1
         self.RATE = 16000
+        self.CAPTURE_DECIMATION = 4
+        self.FEATURE_RATE = self.RATE // self.CAPTURE_DECIMATION  # rate stored in the ring
         self.WINDOW_DURATION = 3
-        self.WINDOW_SIZE = int(self.RATE * self.WINDOW_DURATION)
+        self.WINDOW_SIZE = int(self.FEATURE_RATE * self.WINDOW_DURATION)
+        self.HOP_SIZE = self.FEATURE_RATE  # analyse a new window every second
         
         # Engagement mapping
         self.ENGAGED_EMOTIONS = {'neutral', 'happy', 'surprised', 'calm'}
         
-        # Threading and state
+        # Threading and state: audio_thread runs feature extraction and
+        # prediction; the UI only pops finished results
         self.is_recording = False
         self.audio_thread = None
-        self.audio_buffer = np.zeros(self.WINDOW_SIZE, dtype=np.float32) if AUDIO_AVAILABLE else None
-        self.buffer_index = 0
+        self._result_queue = queue.Queue(maxsize=8)
+        self._last_analysis = None
+        
+        # Lock-free SPSC ring buffer: the PyAudio callback is the only writer
+        # of _head and the Streamlit thread the only writer of _tail, so plain
+        # int stores (atomic under the GIL) are enough to hand samples over
+        self.RING_SIZE = 1 << (self.WINDOW_SIZE - 1).bit_length()
+        self._ring = np.zeros(self.RING_SIZE, dtype=np.float32)
+        self._mask = self.RING_SIZE - 1
+        self._head = 0
+        self._tail = 0
+        
+        # Running zero-crossing count over the last window, maintained by the
+        # callback (Numba only). _zcr_at pairs the count with the head it
+        # belongs to so the consumer can tell whether it matches its window.
+        self._zcr_bits = np.zeros(self.RING_SIZE // 8, dtype=np.uint8)
+        self._zcr_running = 0
+        self._last_sign = True
+        self._zcr_at = (0, 0)
+        
+        # Callback scratch buffers: the int16 -> float32 conversion lands in
+        # _fir_buf behind the previous chunk's last (taps - 1) samples, and
+        # the low-passed, decimated chunk in _chunk_ds, with each tap's term
+        # in _fir_scratch. CHUNK_SIZE must be a multiple of CAPTURE_DECIMATION
+        # to keep the decimation phase.
+        self._fir_taps = np.array([0.125, 0.375, 0.375, 0.125], dtype=np.float32)
+        self._fir_buf = np.zeros(self.CHUNK_SIZE + len(self._fir_taps) - 1, dtype=np.float32)
+        self._chunk_ds = np.empty(self.CHUNK_SIZE // self.CAPTURE_DECIMATION, dtype=np.float32)
+        self._fir_scratch = np.empty_like(self._chunk_ds)
+        
+        # Spectral features share one batched FFT over N_FFT-sample frames;
+        # the window, bin frequencies and mel/DCT matrices are fixed
+        self.N_FFT = 256
+        self.N_MELS = 26
+        self.N_MFCC = 4
+        self._hann = np.hanning(self.N_FFT).astype(np.float32)
+        self._fft_freqs = np.fft.rfftfreq(self.N_FFT, 1.0 / self.FEATURE_RATE).astype(np.float32)
+        self._mel_fb = _mel_filterbank(self.FEATURE_RATE, self.N_FFT, self.N_MELS)
+        self._dct = _dct_matrix(self.N_MFCC, self.N_MELS)
+        
+        # Feature vector reused for every window, already shaped for predict
+        self.N_FEATURES = 15
+        self._feat_buf = np.empty((1, self.N_FEATURES), dtype=np.float32)
+        
+        # Windows collected for one batched prediction (~10 s of audio)
+        self.BATCH_SIZE = 8
+        self._pending = np.empty((self.BATCH_SIZE, self.N_FEATURES), dtype=np.float32)
+        self._pending_i = 0
+        
+        # Set once the callback thread has tried to raise its priority
+        self._rt_priority_checked = False
         
         # PyAudio instance
         self.audio = None
@@ -58,20 +419,88 @@ class StreamlitAudioProcessor:
             return False
             
         try:
-            if self.model_path.exists():
-                self.model_data = joblib.load(self.model_path)
-                self.model = self.model_data['model']
-                self.scaler = self.model_data['scaler']
-                return True
+            # A single stat both checks existence and gives the cache key
+            mtime = self.model_path.stat().st_mtime
+            model, scaler = _load_model(str(self.model_path), mtime)
+            
+            # Flag a model trained on a different feature layout once here,
+            # rather than failing on every window; recording still works and
+            # windows are reported as 'unknown'
+            n_expected = getattr(model, 'n_features_in_', None)
+            self._features_match = n_expected is None or n_expected == self.N_FEATURES
+            if not self._features_match:
+                st.warning(
+                    f"Emotion model {self.model_path.name} expects {n_expected} features, "
+                    f"but the audio extractor produces {self.N_FEATURES}; emotions will be reported as unknown"
+                )
+            
+            self.model, self.scaler = model, scaler
+            if hasattr(self.model, 'classes_'):
+                self._classes_lower = np.array([str(c).lower() for c in self.model.classes_])
+                self._engaged_mask = np.array(
+                    [c in self.ENGAGED_EMOTIONS for c in self._classes_lower], dtype=bool
+                )
+                self._class_ids = {c: i for i, c in enumerate(self._classes_lower)}
+            
+            # float32 copies of the StandardScaler parameters for _scale
+            mean = getattr(self.scaler, 'mean_', None)
+            scale = getattr(self.scaler, 'scale_', None)
+            if mean is not None and scale is not None:
+                self._scale_mean = mean.astype(np.float32)
+                self._scale_inv = (1.0 / scale).astype(np.float32)
+            
+            # Resolve the probability function once rather than per window
+            self._has_proba = hasattr(self.model, 'predict_proba')
+            if ONNX_AVAILABLE and self._has_proba and self._features_match:
+                self._onnx_session = _load_onnx_session(str(self.model_path), mtime)
+            if self._onnx_session is not None:
+                self._proba_fn = self._onnx_predict_proba
             else:
-                st.error(f"Model file not found: {self.model_path}")
-                return False
+                self._proba_fn = self.model.predict_proba if self._has_proba else None
+            return True
+        except FileNotFoundError:
+            st.error(f"Model file not found: {self.model_path}")
+            return False
         except Exception as e:
             st.error(f"Error loading model: {str(e)}")
             return False
     
-    def extract_features(self, audio_data):
-        """Extract audio features from numpy array"""
+    def _spectral_features(self, audio_data, out):
+        """Write spectral centroid, rolloff, flux and MFCC 1-4 to out[:7]
+        
+        All seven come from a single rfft over non-overlapping Hann-windowed
+        N_FFT frames of the window.
+        """
+        n_frames = len(audio_data) // self.N_FFT
+        if n_frames == 0:
+            out[:7] = 0.0
+            return
+        
+        frames = audio_data[:n_frames * self.N_FFT].reshape(n_frames, self.N_FFT)
+        mag = np.abs(np.fft.rfft(frames * self._hann, axis=1))
+        
+        # Mean centroid, rolloff and flux
+        _spectral_stats(mag, self._fft_freqs, out)
+        
+        # MFCCs of the mean power spectrum
+        mel = self._mel_fb @ np.square(mag).mean(axis=0)
+        mfcc = self._dct @ np.log(mel + 1e-10)
+        out[3:7] = mfcc
+    
+    def extract_features(self, audio_data, zcr=None, out=None):
+        """Extract audio features from numpy array
+        
+        Audio is expected at FEATURE_RATE, i.e. as decimated by the capture
+        callback (16 kHz -> 4 kHz). ZCR is divided by CAPTURE_DECIMATION so
+        it is reported per 16 kHz sample, as it was before capture-side
+        decimation. A ZCR tracked incrementally by the capture callback can
+        be passed in as `zcr` and is used instead. Features are written to
+        `out` (a row of the batch buffer) when given.
+        
+        These N_FEATURES values are not the MFCC/chroma/mel layout of the
+        shipped model; when a model's n_features_in_ differs, load_model
+        flags it and predictions report 'unknown'.
+        """
         if not AUDIO_AVAILABLE:
             return None
             
@@ -80,67 +509,101 @@ class StreamlitAudioProcessor:
                 return None
             
             # Ensure audio is float
-            audio_data = audio_data.astype(np.float32)
+            audio_data = audio_data.astype(np.float32, copy=False)
             
-            # Basic features without librosa
-            features = []
+            features = self._feat_buf[0] if out is None else out
             
-            # Simple statistical features
-            features.extend([
-                np.mean(audio_data),
-                np.std(audio_data),
-                np.max(audio_data),
-                np.min(audio_data),
-                np.median(audio_data),
-                np.var(audio_data)
-            ])
-            
-            # Zero crossing rate (simple version)
-            zero_crossings = np.where(np.diff(np.signbit(audio_data)))[0]
-            zcr = len(zero_crossings) / len(audio_data)
-            features.append(zcr)
-            
-            # RMS energy
-            rms = np.sqrt(np.mean(audio_data**2))
-            features.append(rms)
+            # Statistical features, ZCR and RMS in a single pass
+            _fused_stats(audio_data, features)
+            features[4] = _median(audio_data)
+            if zcr is None:
+                features[6] /= self.CAPTURE_DECIMATION
+            else:
+                features[6] = zcr
             
-            # Add more simple features to match expected input size
-            features.extend([0] * 7)  # Placeholder features
+            # Spectral centroid, rolloff, flux and MFCCs
+            self._spectral_features(audio_data, features[8:])
             
-            return np.array(features)
+            return features.reshape(1, -1)
             
         except Exception as e:
-            st.error(f"Feature extraction error: {str(e)}")
+            logger.error("Feature extraction error: %s", e)
             return None
     
+    def _scale(self, features):
+        """Standardize features without leaving float32
+        
+        StandardScaler.transform validates its input and promotes it to
+        float64; this is the same affine map on float32. Other scalers go
+        through transform as before.
+        """
+        if self._scale_mean is not None:
+            return (features - self._scale_mean) * self._scale_inv
+        if self.scaler:
+            return self.scaler.transform(features)
+        return features
+    
+    def _onnx_predict_proba(self, features):
+        """Class probabilities from the ONNX Runtime session"""
+        inputs = {'input': np.asarray(features, dtype=np.float32)}
+        return self._onnx_session.run(None, inputs)[1]
+    
     def predict_emotion(self, features):
         """Predict emotion from features"""
         try:
-            if features is None or self.model is None:
+            if features is None or self.model is None or not self._features_match:
                 return "unknown", 0.0
             
-            # Reshape features for prediction
-            features = features.reshape(1, -1)
-            
             # Scale features
-            if self.scaler:
-                features = self.scaler.transform(features)
+            features = self._scale(features)
             
-            # Make prediction
-            prediction = self.model.predict(features)[0]
+            # One predict_proba call gives both the class and its confidence
+            if self._has_proba:
+                probabilities = self._proba_fn(features)[0]
+                idx = int(np.argmax(probabilities))
+                return self._classes_lower[idx], float(probabilities[idx])
             
-            # Get confidence if available
+            prediction = self.model.predict(features)[0]
             confidence = 0.8  # Default confidence
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(features)[0]
-                confidence = np.max(probabilities)
-            
             return prediction.lower(), confidence
             
         except Exception as e:
-            st.error(f"Prediction error: {str(e)}")
+            logger.error("Prediction error: %s", e)
             return "error", 0.0
     
+    def predict_batch(self, features):
+        """Predict a single (emotion, confidence, engagement) for a batch of feature rows
+        
+        Row probabilities are averaged before taking the argmax, and the
+        engagement comes from a per-class mask built at load time; models
+        without predict_proba fall back to a majority vote.
+        """
+        try:
+            if self.model is None or not self._features_match:
+                return "unknown", 0.0, self.map_to_engagement("unknown")
+            
+            # Scale all rows at once
+            features = self._scale(features)
+            
+            if self._has_proba:
+                probabilities = self._proba_fn(features).mean(axis=0)
+                idx = int(np.argmax(probabilities))
+                engagement = 'Engaged' if self._engaged_mask[idx] else 'Distracted'
+                return self._classes_lower[idx], float(probabilities[idx]), engagement
+            
+            labels, counts = np.unique(self.model.predict(features), return_counts=True)
+            emotion = str(labels[np.argmax(counts)]).lower()
+            confidence = 0.8  # Default confidence
+            return emotion, confidence, self.map_to_engagement(emotion)
+            
+        except Exception as e:
+            logger.error("Prediction error: %s", e)
+            return "error", 0.0, self.map_to_engagement("error")
+    
+    def emotion_id(self, emotion):
+        """Index of an emotion label in model.classes_, or -1 if unknown"""
+        return self._class_ids.get(emotion, -1)
+    
     def map_to_engagement(self, emotion):
         """Map emotion to engagement level"""
         if emotion.lower() in self.ENGAGED_EMOTIONS:
@@ -148,6 +611,83 @@ class StreamlitAudioProcessor:
         else:
             return 'Distracted'
     
+    def _ring_write(self, samples):
+        """Append samples to the ring buffer (producer side)"""
+        n = len(samples)
+        start = self._head & self._mask
+        first = min(n, self.RING_SIZE - start)
+        self._ring[start:start + first] = samples[:first]
+        if first < n:
+            self._ring[:n - first] = samples[first:]
+        
+        if NUMBA_AVAILABLE:
+            self._zcr_running, self._last_sign = _update_crossings(
+                samples, self._zcr_bits, self._head, self._mask,
+                self.WINDOW_SIZE - 1, self._last_sign, self._zcr_running
+            )
+            self._zcr_at = (self._head + n, self._zcr_running)
+        
+        # Publish only once the samples are in place
+        self._head += n
+    
+    def _ring_read_window(self):
+        """Return the latest full window and its ZCR if a new hop is ready (consumer side)
+        
+        The ZCR is per 16 kHz sample, or None when it isn't tracked or the
+        producer has already moved past this window. The window is a view
+        into the ring unless it wraps; the producer only overwrites it after
+        RING_SIZE - WINDOW_SIZE more samples, far longer than feature
+        extraction takes.
+        """
+        head = self._head
+        if head < self.WINDOW_SIZE or head - self._tail < self.HOP_SIZE:
+            return None, None
+        
+        zcr_head, zcr_count = self._zcr_at
+        zcr = None
+        if zcr_head == head:
+            zcr = zcr_count / (self.WINDOW_SIZE * self.CAPTURE_DECIMATION)
+        
+        start = (head - self.WINDOW_SIZE) & self._mask
+        end = start + self.WINDOW_SIZE
+        if end <= self.RING_SIZE:
+            window = self._ring[start:end]
+        else:
+            window = np.concatenate((self._ring[start:], self._ring[:end - self.RING_SIZE]))
+        
+        self._tail = head
+        return window, zcr
+    
+    def _cb(self, in_data, frame_count, time_info, status):
+        """PyAudio stream callback, runs on PortAudio's thread"""
+        if not self._rt_priority_checked:
+            # sched_setscheduler(0, ...) applies to the calling thread, so this
+            # has to happen here rather than in start_recording
+            self._rt_priority_checked = True
+            _elevate_current_thread()
+        
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        n = len(samples)
+        hist = len(self._fir_taps) - 1
+        d = self.CAPTURE_DECIMATION
+        
+        # Cast and scale in one vectorized pass, without allocating
+        chunk = self._fir_buf[hist:hist + n]
+        np.multiply(samples, np.float32(1.0 / 32768.0), out=chunk, dtype=np.float32)
+        
+        # Low-pass and decimate to FEATURE_RATE in one polyphase pass that
+        # only computes the outputs that are kept
+        ds = self._chunk_ds[:(n + d - 1) // d]
+        term = self._fir_scratch[:len(ds)]
+        np.multiply(self._fir_buf[0:n:d], self._fir_taps[0], out=ds)
+        for k in range(1, len(self._fir_taps)):
+            np.multiply(self._fir_buf[k:n + k:d], self._fir_taps[k], out=term)
+            np.add(ds, term, out=ds)
+        self._fir_buf[:hist] = self._fir_buf[n:n + hist]
+        
+        self._ring_write(ds)
+        return (None, pyaudio.paContinue)
+    
     def start_recording(self):
         """Start audio recording"""
         if not AUDIO_AVAILABLE:
@@ -170,12 +710,27 @@ class StreamlitAudioProcessor:
                 rate=self.RATE,
                 input=True,
                 frames_per_buffer=self.CHUNK_SIZE,
-                start=False
+                start=False,
+                stream_callback=self._cb
             )
             
+            self._head = 0
+            self._tail = 0
+            self._zcr_bits.fill(0)
+            self._zcr_running = 0
+            self._last_sign = True
+            self._zcr_at = (0, 0)
+            self._pending_i = 0
+            self._fir_buf.fill(0)
+            self._rt_priority_checked = False
+            self._result_queue = queue.Queue(maxsize=8)
+            self._last_analysis = None
             self.is_recording = True
             self.stream.start_stream()
             
+            self.audio_thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self.audio_thread.start()
+            
             return True
             
         except Exception as e:
@@ -189,6 +744,9 @@ class StreamlitAudioProcessor:
             
         try:
             self.is_recording = False
+            if self.audio_thread:
+                self.audio_thread.join(timeout=2)
+                self.audio_thread = None
             
             if self.stream:
                 self.stream.stop_stream()
@@ -202,26 +760,92 @@ class StreamlitAudioProcessor:
         except Exception as e:
             st.error(f"Error stopping audio recording: {str(e)}")
     
-    def get_latest_analysis(self):
-        """Get the latest emotion analysis"""
-        if not AUDIO_AVAILABLE:
+    def _analyze_next_window(self):
+        """Run the ML path on the next ready window, returning a result dict or None"""
+        window, zcr = self._ring_read_window()
+        if window is None:
             return None
-            
-        # Simulate analysis for demo purposes when audio is not available
+        
+        # Collect BATCH_SIZE windows, then classify them in one call; until
+        # then the UI keeps showing the previous result
+        if self.extract_features(window, zcr, out=self._pending[self._pending_i]) is None:
+            return None
+        self._pending_i += 1
+        if self._pending_i < self.BATCH_SIZE:
+            return None
+        self._pending_i = 0
+        
+        emotion, confidence, engagement = self.predict_batch(self._pending)
+        
         return {
-            'emotion': 'neutral',
-            'confidence': 0.8,
-            'engagement': 'Engaged',
+            'emotion': emotion,
+            'confidence': confidence,
+            'engagement': engagement,
             'timestamp': time.time()
         }
+    
+    def _worker_loop(self):
+        """Background analysis loop, consuming windows from the ring buffer"""
+        while self.is_recording:
+            try:
+                analysis = self._analyze_next_window()
+                if analysis is None:
+                    time.sleep(0.1)
+                    continue
+                
+                # Drop the oldest result rather than block when the UI lags
+                try:
+                    self._result_queue.put_nowait(analysis)
+                except queue.Full:
+                    try:
+                        self._result_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._result_queue.put_nowait(analysis)
+                
+            except Exception as e:
+                logger.error("Audio analysis loop error: %s", e)
+                time.sleep(1)
+    
+    def get_latest_analysis(self):
+        """Get the latest emotion analysis"""
+        if not AUDIO_AVAILABLE:
+            return None
+        
+        try:
+            self._last_analysis = self._result_queue.get_nowait()
+        except queue.Empty:
+            pass
+        return self._last_analysis
 
-@st.cache_resource
 def get_audio_processor():
-    """Get cached audio processor instance"""
-    return StreamlitAudioProcessor()
+    """Get the audio processor for the current session
+    
+    Each session owns its own PyAudio stream, so the processor lives in
+    session state; the model it uses is shared through _load_model.
+    """
+    if 'audio_processor' not in st.session_state:
+        st.session_state.audio_processor = StreamlitAudioProcessor()
+    return st.session_state.audio_processor
+
+def get_audio_history():
+    """Return the session's audio history records, oldest first"""
+    hist = st.session_state.get('audio_hist')
+    if hist is None:
+        return np.zeros(0, dtype=AUDIO_HISTORY_DTYPE)
+    
+    # The ring is only unrolled here, never on write
+    i = st.session_state.audio_hist_i
+    if i < AUDIO_HISTORY_LEN:
+        return hist[:i]
+    return np.roll(hist, -(i % AUDIO_HISTORY_LEN))
 
-def render_audio_component():
-    """Render the audio monitoring component"""
+def render_audio_component(autorefresh=True):
+    """Render the audio monitoring component
+    
+    Pass autorefresh=False when the page already schedules its own reruns,
+    so there is a single refresh timer.
+    """
     if not AUDIO_AVAILABLE:
         st.warning("🎤 Audio processing not available in cloud environment")
         st.info("Audio emotion detection requires local installation with PyAudio and librosa")
@@ -262,10 +886,13 @@ def render_audio_component():
     # Initialize session state
     if 'audio_active' not in st.session_state:
         st.session_state.audio_active = False
-    if 'audio_data' not in st.session_state:
-        st.session_state.audio_data = []
+    if 'audio_hist' not in st.session_state:
+        st.session_state.audio_hist = np.zeros(AUDIO_HISTORY_LEN, dtype=AUDIO_HISTORY_DTYPE)
+        st.session_state.audio_hist_i = 0
     if 'last_audio_update' not in st.session_state:
         st.session_state.last_audio_update = 0
+    if 'last_seen_audio_ts' not in st.session_state:
+        st.session_state.last_seen_audio_ts = 0
     
     # Audio controls
     col1, col2, col3 = st.columns(3)
@@ -295,20 +922,29 @@ def render_audio_component():
     if st.session_state.audio_active:
         st.success("🟢 Audio monitoring active")
         
-        # Get latest analysis
+        if autorefresh and AUTOREFRESH_AVAILABLE:
+            st_autorefresh(interval=500, key='audio_refresh')
+        
+        # Get latest analysis (repeated until the worker produces a new one)
         analysis = processor.get_latest_analysis()
         current_time = time.time()
         
-        if analysis and current_time - st.session_state.last_audio_update > 1:
+        # New results are judged by capture time; last_audio_update is UI
+        # wall-clock time and only throttles the display
+        if (analysis and analysis['timestamp'] > st.session_state.last_seen_audio_ts
+                and current_time - st.session_state.last_audio_update > 1):
             st.session_state.current_emotion = analysis['emotion'].title()
             st.session_state.current_engagement = analysis['engagement']
             st.session_state.emotion_confidence = analysis['confidence']
             st.session_state.last_audio_update = current_time
+            st.session_state.last_seen_audio_ts = analysis['timestamp']
             
-            # Store data for history
-            st.session_state.audio_data.append(analysis)
-            if len(st.session_state.audio_data) > 50:  # Keep last 50 entries
-                st.session_state.audio_data = st.session_state.audio_data[-50:]
+            # Store data for history (keeps the last AUDIO_HISTORY_LEN entries)
+            i = st.session_state.audio_hist_i % AUDIO_HISTORY_LEN
+            st.session_state.audio_hist[i] = (
+                analysis['timestamp'], analysis['confidence'], processor.emotion_id(analysis['emotion'])
+            )
+            st.session_state.audio_hist_i += 1
         
         # Display current analysis
         if st.session_state.get('current_emotion'):
@@ -328,8 +964,8 @@ def render_audio_component():
         else:
             st.info("⏳ Waiting for audio data...")
         
-        # Auto-refresh mechanism
-        if analysis:
+        # Auto-refresh fallback (keep polling until the next window is ready)
+        if autorefresh and not AUTOREFRESH_AVAILABLE and processor.is_recording:
             time.sleep(0.5)  # Small delay to prevent too frequent updates
             st.rerun()
     else:
@@ -2,11 +2,19 @@ import streamlit as st
 import numpy as np
 import time
 import threading
-import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import islice
+from collections import Counter, deque
 from pathlib import Path
 import sys
 import os
 
+# Tesseract's OpenMP threading only contends with the Streamlit thread;
+# limit it before anything below can load Tesseract
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
 # Check for screen analysis dependencies
 try:
     import cv2
@@ -15,16 +23,23 @@ try:
     import spacy
     from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
     
+    # capture_screen returns BGRA (mss) or BGR frames
+    _GRAY_CONVERSIONS = {3: cv2.COLOR_BGR2GRAY, 4: cv2.COLOR_BGRA2GRAY}
+    
+    # Pipeline components nothing here uses; skipping them makes loading
+    # and any nlp() call cheaper
+    SPACY_DISABLE = ["parser", "ner", "lemmatizer", "attribute_ruler"]
+    
     # Try to load spacy model, download if needed
     try:
-        nlp = spacy.load("en_core_web_sm")
+        nlp = spacy.load("en_core_web_sm", disable=SPACY_DISABLE)
     except OSError:
         # Model not found, try to download it
         import subprocess
         import sys
         try:
             subprocess.check_call([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
-            nlp = spacy.load("en_core_web_sm")
+            nlp = spacy.load("en_core_web_sm", disable=SPACY_DISABLE)
         except:
             # If download fails, use a simple fallback
             nlp = None
@@ -50,7 +65,7 @@ if SCREEN_ANALYSIS_AVAILABLE:
         import platform
         if platform.system() == "Windows":
             from win_capture import capture_screen
-            from win_window import get_active_app
+            from win_window import get_active_app, get_active_window_rect
             from idle_tracker_win import get_idle_time
         else:
             # Fallback for cloud/Linux environments
@@ -58,62 +73,225 @@ if SCREEN_ANALYSIS_AVAILABLE:
                 return None
             def get_active_app():
                 return "Cloud Environment"
+            def get_active_window_rect():
+                return None
             def get_idle_time():
                 return 0
         
-        from ocr import extract_text
         from context import detect_context
         from sentiment import analyze_sentiment
         from chrome_tab import get_chrome_tab_info
+        from frame_worker import analyze_encoded_frame, init_worker
+        
+        # OCR text rarely changes between captures while reading, so the
+        # NLP results are cached on the text itself
+        detect_context = lru_cache(maxsize=256)(detect_context)
+        analyze_sentiment = lru_cache(maxsize=256)(analyze_sentiment)
         PLATFORM_AVAILABLE = True
     except ImportError:
         PLATFORM_AVAILABLE = False
 
+# Window-title markers of the browser get_chrome_tab_info can query
+_CHROME_MARKERS = frozenset({"chrome"})
+
+def _is_chrome(app):
+    """Whether the active window title belongs to Chrome"""
+    app_lc = (app or "").lower()
+    return any(marker in app_lc for marker in _CHROME_MARKERS)
+
+def _maybe_chrome_info(app):
+    """Chrome tab (title, url) when the active app is Chrome, else (None, None)"""
+    if _is_chrome(app):
+        try:
+            return get_chrome_tab_info()
+        except:
+            pass
+    return None, None
+
 class StreamlitScreenProcessor:
     """Screen processor adapted for Streamlit"""
     
     def __init__(self):
         self.is_monitoring = False
         self.analysis_thread = None
-        self.analysis_queue = queue.Queue()
+        # Latest analysis only; the UI never wants older readings. A plain
+        # attribute store is atomic, and readers tell new from old by timestamp
+        self._latest = None
         self.update_interval = 5  # seconds
         
+        # Last full OCR/NLP result, reused while the screen is unchanged
+        self.reuse_max_age = 30  # seconds
+        self._last_thumb = None
+        self.change_tolerance = 16  # gray levels a thumbnail pixel may drift (antialiasing, cursor)
+        self.change_fraction = 0.02  # share of thumbnail pixels that must change to re-run OCR
+        self._last_full = 0
+        self._last_result = None
+        
+        # Poll less often while the user is away from the keyboard
+        self.idle_backoff_after = 30  # seconds idle before backing off
+        self.idle_backoff_max = 60  # longest interval between captures
+        self.idle_skip_after = 300  # seconds idle before skipping capture entirely
+        self._idle_backoff = self.update_interval
+        
+        # OCR input is downscaled to at most this many pixels on its long edge
+        self.ocr_max_edge = 1600
+        # Height of Chrome's tab strip and toolbar, left out of OCR since the
+        # tab title and URL come from get_chrome_tab_info
+        self.chrome_toolbar_px = 80
+        
+        # OCR, context and sentiment run in a worker process so they don't
+        # hold the GIL the Streamlit thread needs. One worker is enough, as
+        # the loop has one frame in flight; more would only duplicate the
+        # loaded OCR models.
+        self._pool = None
+        self._ocr_future = None  # last frame handed to the worker
+        self.ocr_timeout = 10  # seconds
+        self.ocr_timeouts = 0  # frames dropped because OCR took too long
+        self.ipc_jpeg_quality = 85  # frames are JPEG-encoded for the worker
+        
+        # Runs the window/idle/Chrome queries alongside capture and OCR
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="screen-query")
+        
+    def _crop_to_window(self, frame, rect, skip_top=0):
+        """Crop the frame to the active window (a view, no copy), leaving out
+        its top `skip_top` pixels; returns the whole frame if that fails"""
+        image = np.asarray(frame)
+        if rect is None:
+            return image
+        
+        # Clamp to the captured area (windows can extend off-screen)
+        h, w = image.shape[:2]
+        x0, y0, x1, y1 = rect
+        x0, x1 = max(0, x0), min(w, x1)
+        y0, y1 = max(0, y0), min(h, y1)
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return image
+        if y1 - y0 > 2 * skip_top:
+            y0 += skip_top
+        return image[y0:y1, x0:x1]
+        
+    def _prepare_for_ocr(self, image):
+        """Grayscale copy of the image, downscaled to at most ocr_max_edge px on its long edge"""
+        h, w = image.shape[:2]
+        scale = self.ocr_max_edge / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, _GRAY_CONVERSIONS[image.shape[2]])
+        return image
+        
+    def _analyze_text(self, image):
+        """(text, context, sentiment) for an OCR-ready image, in the worker process when possible
+        
+        Raises FutureTimeout when the worker takes longer than ocr_timeout,
+        and also while it is still busy with a frame that timed out, so
+        frames never queue up behind a slow one.
+        """
+        pool = self._pool
+        if pool is not None:
+            pending = self._ocr_future
+            if pending is not None and not pending.done():
+                raise FutureTimeout
+            try:
+                ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.ipc_jpeg_quality])
+                if ok:
+                    fut = self._ocr_future = pool.submit(analyze_encoded_frame, buf.tobytes())
+                    try:
+                        return fut.result(timeout=self.ocr_timeout)
+                    except FutureTimeout:
+                        # Only succeeds if the worker hasn't picked it up yet
+                        fut.cancel()
+                        raise
+            except BrokenProcessPool:
+                print("OCR worker process died, running OCR in-process")
+                self._pool = None
+            except RuntimeError:
+                # Pool shut down by stop_monitoring while this frame was in hand
+                pass
+        
+        # Imported only here: importing ocr loads Tesseract (or the EasyOCR
+        # GPU reader), which the worker process already holds its own copy of
+        from ocr import extract_text
+        
+        text = extract_text(image)
+        return text, detect_context(text), analyze_sentiment(text)
+        
+    def _thumbnail(self, frame):
+        """64x64 grayscale thumbnail of the frame"""
+        small = cv2.resize(np.asarray(frame), (64, 64), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, _GRAY_CONVERSIONS[small.shape[2]])
+        return small
+    
+    def _screen_changed(self, thumb):
+        """Whether enough of the thumbnail differs from the last fully analysed one"""
+        if self._last_thumb is None:
+            return True
+        diff = cv2.absdiff(thumb, self._last_thumb)
+        _, changed = cv2.threshold(diff, self.change_tolerance, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(changed) >= self.change_fraction * changed.size
+        
     def capture_and_analyze(self):
         """Capture screen and perform analysis"""
         try:
             if not SCREEN_ANALYSIS_AVAILABLE:
                 return None
             
-            # Get current app
-            app = get_active_app()
+            # Query current app and idle time in the background
+            fut_app = self._executor.submit(get_active_app)
+            fut_idle = self._executor.submit(get_idle_time)
+            fut_rect = self._executor.submit(get_active_window_rect)
+            idle_seconds = fut_idle.result()
+            
+            # Long idle: report it without capturing the screen
+            if idle_seconds > self.idle_skip_after:
+                return {
+                    'timestamp': time.time(),
+                    'active_app': fut_app.result(),
+                    'text_content': "",
+                    'context': "idle",
+                    'sentiment': "neutral",
+                    'idle_seconds': idle_seconds,
+                    'chrome_title': None,
+                    'chrome_url': None,
+                    'text_length': 0
+                }
             
             # Capture screen
             frame = capture_screen()
+            app = fut_app.result()
             if frame is None:
                 return None
             
-            # Extract text using OCR
-            text = extract_text(frame)
-            
-            # Detect context
-            context = detect_context(text)
+            # Skip OCR/NLP when the screen hasn't changed since the last full pass
+            now = time.time()
+            thumb = self._thumbnail(frame)
+            if (self._last_result is not None and not self._screen_changed(thumb)
+                    and now - self._last_full < self.reuse_max_age):
+                result = dict(self._last_result)
+                result['timestamp'] = now
+                result['active_app'] = app
+                result['idle_seconds'] = idle_seconds
+                return result
             
-            # Analyze sentiment
-            sentiment = analyze_sentiment(text)
+            # Get Chrome tab info if applicable, while OCR runs
+            fut_chrome = self._executor.submit(_maybe_chrome_info, app)
             
-            # Get idle time
-            idle_seconds = get_idle_time()
+            # Extract text using OCR, on a small grayscale copy of the active
+            # window, then detect context and analyze sentiment
+            skip_top = self.chrome_toolbar_px if _is_chrome(app) else 0
+            roi = self._crop_to_window(frame, fut_rect.result(), skip_top)
+            try:
+                text, context, sentiment = self._analyze_text(self._prepare_for_ocr(roi))
+            except FutureTimeout:
+                self.ocr_timeouts += 1
+                print(f"OCR timed out or still busy, frame dropped ({self.ocr_timeouts} so far)")
+                return None
             
-            # Get Chrome tab info if applicable
-            title, url = None, None
-            if "chrome" in app.lower():
-                try:
-                    title, url = get_chrome_tab_info()
-                except:
-                    pass
+            title, url = fut_chrome.result()
             
-            return {
-                'timestamp': time.time(),
+            result = {
+                'timestamp': now,
                 'active_app': app,
                 'text_content': text[:500] if text else "",  # Limit text length
                 'context': context,
@@ -124,24 +302,49 @@ class StreamlitScreenProcessor:
                 'text_length': len(text) if text else 0
             }
             
+            self._last_thumb = thumb
+            self._last_full = now
+            self._last_result = result
+            return result
+            
         except Exception as e:
             st.error(f"Screen analysis error: {str(e)}")
             return None
     
     def monitoring_loop(self):
         """Background monitoring loop"""
+        self._idle_backoff = self.update_interval
         while self.is_monitoring:
             try:
                 analysis = self.capture_and_analyze()
                 if analysis:
-                    self.analysis_queue.put(analysis)
+                    self._latest = analysis
+                    
+                    # Back off exponentially while idle, reset on activity
+                    if analysis['idle_seconds'] > self.idle_backoff_after:
+                        self._idle_backoff = min(self._idle_backoff * 2, self.idle_backoff_max)
+                    else:
+                        self._idle_backoff = self.update_interval
                 
-                time.sleep(self.update_interval)
+                self._wait(self._idle_backoff)
                 
             except Exception as e:
                 print(f"Monitoring loop error: {e}")
                 time.sleep(1)
     
+    def _wait(self, seconds):
+        """Sleep for up to `seconds`, waking early on user activity or stop"""
+        if seconds <= self.update_interval:
+            time.sleep(seconds)
+            return
+        
+        deadline = time.time() + seconds
+        while self.is_monitoring and time.time() < deadline:
+            time.sleep(1)
+            if get_idle_time() < self.idle_backoff_after:
+                self._idle_backoff = self.update_interval
+                return
+    
     def start_monitoring(self, interval=5):
         """Start screen monitoring"""
         if not SCREEN_ANALYSIS_AVAILABLE:
@@ -152,6 +355,12 @@ class StreamlitScreenProcessor:
             self.update_interval = interval
             self.is_monitoring = True
             
+            if PLATFORM_AVAILABLE and self._pool is None:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=1, initializer=init_worker)
+                except Exception as e:
+                    print(f"OCR worker process unavailable, running OCR in-process: {e}")
+            
             self.analysis_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
             self.analysis_thread.start()
             
@@ -166,26 +375,29 @@ class StreamlitScreenProcessor:
         self.is_monitoring = False
         if self.analysis_thread:
             self.analysis_thread.join(timeout=2)
+        
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._ocr_future = None
     
     def get_latest_analysis(self):
         """Get the latest screen analysis"""
-        try:
-            if not self.analysis_queue.empty():
-                return self.analysis_queue.get_nowait()
-            return None
-        except queue.Empty:
-            return None
-        except Exception as e:
-            st.error(f"Error getting analysis: {str(e)}")
-            return None
+        # Between samples hand back the previous one so reruns don't blank;
+        # the render loop tells new from old by timestamp
+        return self._latest
 
 @st.cache_resource
 def get_screen_processor():
     """Get cached screen processor instance"""
     return StreamlitScreenProcessor()
 
-def render_screen_component():
-    """Render the screen monitoring component"""
+def render_screen_component(autorefresh=True):
+    """Render the screen monitoring component
+    
+    Pass autorefresh=False when the page already schedules its own reruns,
+    so there is a single refresh timer.
+    """
     if not SCREEN_ANALYSIS_AVAILABLE or not PLATFORM_AVAILABLE:
         st.warning("🖥️ Screen analysis not available in cloud environment")
         st.info("Screen monitoring requires local installation with system access")
@@ -225,9 +437,11 @@ def render_screen_component():
     if 'screen_active' not in st.session_state:
         st.session_state.screen_active = False
     if 'screen_data' not in st.session_state:
-        st.session_state.screen_data = []
+        st.session_state.screen_data = deque(maxlen=50)  # Keep last 50 entries
     if 'last_screen_update' not in st.session_state:
         st.session_state.last_screen_update = 0
+    if 'last_seen_analysis_ts' not in st.session_state:
+        st.session_state.last_seen_analysis_ts = 0
     
     # Screen controls
     col1, col2, col3 = st.columns(3)
@@ -257,20 +471,22 @@ def render_screen_component():
     if st.session_state.screen_active:
         st.success("🟢 Screen monitoring active")
         
-        # Get latest analysis
+        # Get latest analysis (repeated until the monitor produces a new one)
         analysis = processor.get_latest_analysis()
         current_time = time.time()
+        # Capture times are compared with capture times; last_screen_update
+        # is UI wall-clock time and only throttles the display
+        is_new = analysis is not None and analysis['timestamp'] > st.session_state.last_seen_analysis_ts
         
-        if analysis and current_time - st.session_state.last_screen_update > 1:
+        if is_new and current_time - st.session_state.last_screen_update > 1:
             # Update session state
             st.session_state.current_context = analysis['context']
             st.session_state.current_sentiment = analysis['sentiment']
             st.session_state.last_screen_update = current_time
+            st.session_state.last_seen_analysis_ts = analysis['timestamp']
             
             # Store data for history
             st.session_state.screen_data.append(analysis)
-            if len(st.session_state.screen_data) > 50:  # Keep last 50 entries
-                st.session_state.screen_data = st.session_state.screen_data[-50:]
         
         # Display current analysis
         if st.session_state.screen_data:
@@ -295,8 +511,17 @@ def render_screen_component():
             
             # Show recent text content (if any)
             if latest.get('text_content'):
+                # Only touch the widget's value when the text changes; with a
+                # fixed key the browser keeps the same text area across reruns.
+                # Streamlit drops the value after any run that doesn't render
+                # the widget, so it is also set again whenever it is missing
+                text_hash = hash(latest['text_content'])
+                if (st.session_state.get('_text_hash') != text_hash
+                        or 'detected_text' not in st.session_state):
+                    st.session_state.detected_text = latest['text_content']
+                    st.session_state._text_hash = text_hash
                 with st.expander("📝 Recent Text Content"):
-                    st.text_area("Detected Text", latest['text_content'], height=100)
+                    st.text_area("Detected Text", key='detected_text', height=100, disabled=True)
             
             # Auto-refresh indicator
             st.write(f"🔄 Last updated: {time.strftime('%H:%M:%S', time.localtime(latest['timestamp']))}")
@@ -304,7 +529,7 @@ def render_screen_component():
             st.info("⏳ Waiting for screen data...")
         
         # Auto-refresh mechanism
-        if analysis:
+        if autorefresh and is_new:
             time.sleep(0.5)  # Small delay to prevent too frequent updates
             st.rerun()
     else:
@@ -312,6 +537,39 @@ def render_screen_component():
     
     return processor if st.session_state.screen_active else None
 
+# Columns of session_data kept as parallel deques for vectorised summaries
+SESSION_COLUMNS = ('timestamp', 'context', 'engagement')
+PRODUCTIVE_CONTEXTS = ('programming', 'reading', 'writing', 'learning')
+PRODUCTIVITY_WINDOW = 10  # Most recent data points the productivity score covers
+
+def _session_columns():
+    """Columnar view of session_data, rebuilt if it's missing or out of sync"""
+    data = st.session_state.get('session_data', [])
+    cols = st.session_state.get('session_cols')
+    if (cols is None or len(cols['timestamp']) != len(data)
+            or (data and cols['timestamp'][-1] != data[-1].get('timestamp'))):
+        maxlen = getattr(data, 'maxlen', None)
+        cols = {
+            'timestamp': deque((item.get('timestamp', time.time()) for item in data), maxlen=maxlen),
+            'context': deque((item.get('context', 'Unknown') for item in data), maxlen=maxlen),
+            'engagement': deque((item.get('engagement', '') for item in data), maxlen=maxlen),
+        }
+        st.session_state.session_cols = cols
+    return cols
+
+def _context_counts():
+    """Running Counter of the contexts in session_data, rebuilt if out of sync"""
+    data = st.session_state.get('session_data', [])
+    counts = st.session_state.get('context_counts')
+    last_timestamp = data[-1].get('timestamp') if data else None
+    if counts is None or counts['at'] != last_timestamp:
+        counts = {
+            'counter': Counter(_session_columns()['context']),
+            'at': last_timestamp,
+        }
+        st.session_state.context_counts = counts
+    return counts
+
 def render_context_insights():
     """Render context-based insights"""
     if 'session_data' not in st.session_state:
@@ -321,52 +579,88 @@ def render_context_insights():
     
     # Analyze session data for patterns
     if st.session_state.session_data:
-        contexts = [item.get('context', 'Unknown') for item in st.session_state.session_data]
-        sentiments = [item.get('sentiment', 'Neutral') for item in st.session_state.session_data]
+        cols = _session_columns()
         
-        # Context distribution
-        from collections import Counter
-        context_counts = Counter(contexts)
+        # Context distribution from the running counter; recent activity
+        # reads only the tail of the columns
+        context_counts = _context_counts()['counter'].most_common(5)
+        recent = list(zip(islice(reversed(cols['timestamp']), 5),
+                          islice(reversed(cols['context']), 5)))[::-1]
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.write("**Context Distribution:**")
-            for context, count in context_counts.most_common(5):
+            for context, count in context_counts:
                 st.write(f"- {context}: {count}")
         
         with col2:
             st.write("**Recent Activity:**")
-            recent_items = list(st.session_state.session_data)[-5:]
-            for item in recent_items:
-                timestamp = item.get('timestamp', time.time())
-                context = item.get('context', 'Unknown')
+            for timestamp, context in recent:
                 st.write(f"- {time.strftime('%H:%M:%S', time.localtime(timestamp))}: {context}")
     else:
         st.info("No session data available yet. Start monitoring to see insights.")
 
+def _productivity_points(contexts, engagements):
+    """Per-point productivity in integer percent: 70 for a productive context, 30 if engaged"""
+    contexts = np.char.lower(np.asarray(contexts, dtype=str))
+    productive = np.zeros(len(contexts), dtype=bool)
+    for prod_context in PRODUCTIVE_CONTEXTS:
+        productive |= np.char.find(contexts, prod_context) >= 0
+    return 70 * productive + 30 * (np.asarray(engagements, dtype=str) == 'Engaged')
+
+def _productivity_window():
+    """Running points of the last PRODUCTIVITY_WINDOW data points, rebuilt if out of sync"""
+    data = st.session_state.get('session_data', [])
+    prod = st.session_state.get('productivity')
+    last_timestamp = data[-1].get('timestamp') if data else None
+    if prod is None or prod['at'] != last_timestamp:
+        cols = _session_columns()
+        points = _productivity_points(list(cols['context'])[-PRODUCTIVITY_WINDOW:],
+                                      list(cols['engagement'])[-PRODUCTIVITY_WINDOW:])
+        prod = {
+            'window': deque(points.tolist(), maxlen=PRODUCTIVITY_WINDOW),
+            'total': int(points.sum()),
+            'at': last_timestamp,
+        }
+        st.session_state.productivity = prod
+    return prod
+
+def record_session_point(item):
+    """Append a data point to session_data, keeping its columns, the context
+    counts and the running productivity window in step"""
+    cols = _session_columns()
+    prod = _productivity_window()
+    counts = _context_counts()
+    
+    # Count the new context, and uncount the one the full deque is about to drop
+    context = item.get('context', 'Unknown')
+    if cols['context'].maxlen is not None and len(cols['context']) == cols['context'].maxlen:
+        evicted = cols['context'][0]
+        counts['counter'][evicted] -= 1
+        if counts['counter'][evicted] <= 0:
+            del counts['counter'][evicted]
+    counts['counter'][context] += 1
+    
+    st.session_state.session_data.append(item)
+    cols['timestamp'].append(item.get('timestamp', time.time()))
+    cols['context'].append(context)
+    cols['engagement'].append(item.get('engagement', ''))
+    
+    # Slide the productivity window by one point
+    points = int(_productivity_points([item.get('context', '')], [item.get('engagement', '')])[0])
+    if len(prod['window']) == PRODUCTIVITY_WINDOW:
+        prod['total'] -= prod['window'][0]
+    prod['window'].append(points)
+    prod['total'] += points
+    prod['at'] = cols['timestamp'][-1]
+    counts['at'] = cols['timestamp'][-1]
+
 def get_productivity_score():
     """Calculate a simple productivity score based on context and engagement"""
     if 'session_data' not in st.session_state or not st.session_state.session_data:
         return 0
     
-    # Define productive contexts
-    productive_contexts = ['programming', 'reading', 'writing', 'learning']
-    engaged_states = ['Engaged']
-    
-    recent_data = list(st.session_state.session_data)[-10:]  # Last 10 data points
-    
-    productivity_points = 0
-    total_points = len(recent_data)
-    
-    for item in recent_data:
-        context = item.get('context', '').lower()
-        engagement = item.get('engagement', '')
-        
-        if any(prod_context in context for prod_context in productive_contexts):
-            productivity_points += 0.7
-        
-        if engagement in engaged_states:
-            productivity_points += 0.3
-    
-    return min(100, int((productivity_points / total_points) * 100)) if total_points > 0 else 0
\ No newline at end of file
+    # O(1) from the running total over the last PRODUCTIVITY_WINDOW points
+    prod = _productivity_window()
+    return min(100, prod['total'] // len(prod['window']))
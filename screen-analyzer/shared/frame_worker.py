@@ -0,0 +1,32 @@
+# frame_worker.py
+# OCR and text analysis for one captured frame, run inside a worker process
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from context import detect_context
+from sentiment import analyze_sentiment
+
+# Consecutive frames often OCR to the same text
+_detect_context = lru_cache(maxsize=256)(detect_context)
+_analyze_sentiment = lru_cache(maxsize=256)(analyze_sentiment)
+
+def init_worker():
+    # Load the OCR backend here rather than at import: the parent process
+    # imports this module too, only to hand its functions to the pool.
+    # Warm Tesseract/EasyOCR up so the first frame isn't slow
+    from ocr import extract_text
+    extract_text(np.full((32, 32), 255, dtype=np.uint8))
+
+def analyze_frame(image):
+    from ocr import extract_text
+    text = extract_text(image)
+    return text, _detect_context(text), _analyze_sentiment(text)
+
+def analyze_encoded_frame(data):
+    # Frames cross the process boundary JPEG-encoded (~20x fewer bytes to
+    # pickle than the raw array); OpenCV decodes them with libjpeg-turbo
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    return analyze_frame(image)
@@ -1,11 +1,85 @@
 # ocr.py
+import os
+
+# Tesseract's OpenMP threading costs more than it saves on screen text;
+# set before Tesseract is imported or loaded so every run inherits it
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Prefer the smaller, faster tessdata_fast English model when it has been
+# dropped into screen-analyzer/tessdata/
+TESSDATA_FAST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tessdata')
+if os.path.isfile(os.path.join(TESSDATA_FAST_DIR, 'eng.traineddata')):
+    os.environ.setdefault('TESSDATA_PREFIX', TESSDATA_FAST_DIR)
+
+import threading
+
 import cv2
+import numpy as np
 import pytesseract
+from PIL import Image
+
+# tesserocr keeps one Tesseract instance loaded in-process instead of
+# spawning the tesseract binary for every frame
+try:
+    from tesserocr import PyTessBaseAPI, OEM, PSM
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# LSTM engine only, one uniform block of English text
+TESS_CONFIG = '--oem 1 --psm 6 -l eng'
+
+# OCR_BACKEND=easyocr uses EasyOCR on the GPU; Tesseract is used otherwise,
+# and whenever EasyOCR or CUDA isn't available
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'tesseract').lower()
+
+def _load_easyocr_reader():
+    try:
+        import easyocr
+        import torch
+        if not torch.cuda.is_available():
+            print("OCR: CUDA not available, using Tesseract")
+            return None
+        return easyocr.Reader(['en'], gpu=True)
+    except Exception as e:
+        print(f"OCR: EasyOCR unavailable ({e}), using Tesseract")
+        return None
+
+def _load_tess_api():
+    if not TESSEROCR_AVAILABLE:
+        return None
+    try:
+        path = os.environ.get('TESSDATA_PREFIX')
+        if path:
+            return PyTessBaseAPI(path=path, lang='eng', oem=OEM.LSTM_ONLY, psm=PSM.SINGLE_BLOCK)
+        return PyTessBaseAPI(lang='eng', oem=OEM.LSTM_ONLY, psm=PSM.SINGLE_BLOCK)
+    except Exception as e:
+        print(f"OCR: tesserocr unavailable ({e}), using pytesseract")
+        return None
+
+# Built once per process; loading the detection/recognition models is slow
+_reader = _load_easyocr_reader() if OCR_BACKEND == 'easyocr' else None
+_tess_api = _load_tess_api() if _reader is None else None
+_tess_lock = threading.Lock()  # one API handle, not safe to share mid-call
 
 def extract_text(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # Accepts a BGR or BGRA image or an already single-channel grayscale one
+    image = np.asarray(image)
+    if _reader is not None:
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGB if image.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+        return "\n".join(_reader.readtext(image, detail=0, paragraph=True)).strip()
+    
+    if image.ndim == 2:
+        gray = image
+    else:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
     _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     
-    config = '--oem 3 --psm 6'
-    text = pytesseract.image_to_string(thresh, config=config)
+    if _tess_api is not None:
+        with _tess_lock:
+            _tess_api.SetImage(Image.fromarray(thresh))
+            text = _tess_api.GetUTF8Text()
+    else:
+        text = pytesseract.image_to_string(thresh, config=TESS_CONFIG)
     return text.strip()
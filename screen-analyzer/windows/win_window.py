@@ -1,6 +1,27 @@
+import win32api
+import win32con
 import win32gui
 
 def get_active_app():
     window = win32gui.GetForegroundWindow()
     app_name = win32gui.GetWindowText(window)
     return app_name if app_name else "Unknown"
+
+
+def get_active_window_rect():
+    """(left, top, right, bottom) of the foreground window, or None
+    
+    Relative to the top-left of the virtual screen (all monitors), which is
+    where capture_screen's frames start; GetWindowRect's own origin is the
+    primary monitor, so secondary monitors can have negative coordinates.
+    """
+    window = win32gui.GetForegroundWindow()
+    if not window:
+        return None
+    try:
+        left, top, right, bottom = win32gui.GetWindowRect(window)
+        x0 = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
+        y0 = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
+    except Exception:
+        return None
+    return left - x0, top - y0, right - x0, bottom - y0
@@ -23,12 +23,19 @@ sys.path.append(str(components_path))
 # Import custom components
 try:
     from audio_monitor import render_audio_component, get_audio_processor
-    from screen_monitor import render_screen_component, get_screen_processor, render_context_insights, get_productivity_score
+    from screen_monitor import render_screen_component, get_screen_processor, render_context_insights, get_productivity_score, record_session_point
     COMPONENTS_AVAILABLE = True
 except ImportError as e:
     st.warning(f"Some components not available: {e}")
     COMPONENTS_AVAILABLE = False
 
+# Client-side refresh timer, so the script isn't kept busy between updates
+try:
+    from streamlit_autorefresh import st_autorefresh
+    AUTOREFRESH_AVAILABLE = True
+except ImportError:
+    AUTOREFRESH_AVAILABLE = False
+
 # Check if running in cloud environment
 try:
     # Multiple ways to detect cloud environment
@@ -91,6 +98,67 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_data(max_entries=4)
+def _build_session_df(n, last_timestamp, _session_data):
+    """DataFrame of the session data, rebuilt only when a data point is added
+    
+    Cached on the length and latest timestamp; _session_data itself is not
+    hashed. Callers get their own copy and may add columns to it. The
+    columns the charts share (time, hour, engaged_binary) are derived here
+    once per data point rather than by every chart.
+    """
+    df = pd.DataFrame(list(_session_data))
+    if 'timestamp' in df.columns:
+        df['time'] = pd.to_datetime(df['timestamp'], unit='s')
+        df['hour'] = df['time'].dt.hour
+    if 'engagement' in df.columns:
+        df['engaged_binary'] = (df['engagement'].to_numpy() == 'Engaged').astype(np.int8)
+    return df
+
+def _session_key():
+    """(length, latest timestamp) of session_data, the cache key for everything derived from it"""
+    data = st.session_state.session_data
+    return len(data), data[-1].get('timestamp') if data else None
+
+def session_df():
+    """Cached DataFrame of st.session_state.session_data"""
+    return _build_session_df(*_session_key(), st.session_state.session_data)
+
+# Charts and tables derived from the session DataFrame are cached on the
+# same key, so unchanged data reuses the built figure
+
+@st.cache_data(max_entries=4)
+def _engagement_fig(n, last_timestamp, _df):
+    """Engagement over time line chart"""
+    fig = px.line(_df, x='time', y='engaged_binary', 
+                title='Engagement Over Time',
+                labels={'engaged_binary': 'Engaged (1) / Distracted (0)'})
+    fig.update_layout(height=300)
+    return fig
+
+@st.cache_data(max_entries=4)
+def _context_pie(n, last_timestamp, _df):
+    """Context distribution pie chart"""
+    context_counts = _df['context'].value_counts()
+    fig = px.pie(values=context_counts.values, names=context_counts.index,
+               title='Context Distribution')
+    fig.update_layout(height=300)
+    return fig
+
+@st.cache_data(max_entries=4)
+def _hourly_engagement_fig(n, last_timestamp, _df):
+    """Engagement rate by hour bar chart"""
+    hourly_engagement = (_df.groupby('hour')['engaged_binary'].mean() * 100.0).rename('engagement').reset_index()
+    
+    return px.bar(hourly_engagement, x='hour', y='engagement',
+               title='Engagement Rate by Hour',
+               labels={'engagement': 'Engagement Rate (%)'})
+
+@st.cache_data(max_entries=8)
+def _engagement_crosstab(n, last_timestamp, _df, by):
+    """Row-normalised crosstab (%) of the `by` column against engagement"""
+    return pd.crosstab(_df[by], _df['engagement'], normalize='index') * 100
+
 def main():
     """Main Streamlit application"""
     
@@ -169,10 +237,16 @@ def main():
         st.session_state.current_sentiment = "Neutral"
     if 'productivity_score' not in st.session_state:
         st.session_state.productivity_score = 0
+    if 'last_record' not in st.session_state:
+        st.session_state.last_record = 0
     
     # Status indicator
     status_indicator = st.empty()
     
+    # Session DataFrame, built once per rerun and shared by every tab
+    key = _session_key()
+    df = session_df()
+    
     # Create main layout
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard", "🎤 Audio Monitor", "🖥️ Screen Monitor", "📈 Analytics"])
     
@@ -209,32 +283,19 @@ def main():
             
             with col1:
                 # Engagement over time
-                df = pd.DataFrame(list(st.session_state.session_data))
                 if 'timestamp' in df.columns and 'engagement' in df.columns:
-                    df['time'] = pd.to_datetime(df['timestamp'], unit='s')
-                    df['engaged_binary'] = df['engagement'].map({'Engaged': 1, 'Distracted': 0}).fillna(0)
-                    
-                    fig = px.line(df, x='time', y='engaged_binary', 
-                                title='Engagement Over Time',
-                                labels={'engaged_binary': 'Engaged (1) / Distracted (0)'})
-                    fig.update_layout(height=300)
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(_engagement_fig(*key, df), use_container_width=True)
             
             with col2:
                 # Context distribution
                 if 'context' in df.columns:
-                    context_counts = df['context'].value_counts()
-                    fig = px.pie(values=context_counts.values, names=context_counts.index,
-                               title='Context Distribution')
-                    fig.update_layout(height=300)
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(_context_pie(*key, df), use_container_width=True)
         
         # Session summary
         st.subheader("� Session Summary")
         if st.session_state.session_data:
             total_time = len(st.session_state.session_data) * update_interval
-            engaged_count = sum(1 for item in st.session_state.session_data 
-                              if item.get('engagement') == 'Engaged')
+            engaged_count = int(df['engaged_binary'].sum()) if 'engaged_binary' in df.columns else 0
             engagement_rate = (engaged_count / len(st.session_state.session_data)) * 100
             
             summary_col1, summary_col2, summary_col3 = st.columns(3)
@@ -250,14 +311,15 @@ def main():
     with tab2:
         # Audio monitoring tab
         if audio_enabled:
-            audio_processor = render_audio_component()
+            # The page's own refresh (every update_interval) drives reruns
+            audio_processor = render_audio_component(autorefresh=False)
         else:
             st.info("Audio monitoring disabled in settings")
     
     with tab3:
         # Screen monitoring tab
         if screen_enabled:
-            screen_processor = render_screen_component()
+            screen_processor = render_screen_component(autorefresh=False)
             render_context_insights()
         else:
             st.info("Screen monitoring disabled in settings")
@@ -267,24 +329,12 @@ def main():
         st.subheader("📈 Advanced Analytics")
         
         if st.session_state.session_data:
-            df = pd.DataFrame(list(st.session_state.session_data))
-            
             # Time-based analysis
             st.subheader("⏰ Time-based Analysis")
             if 'timestamp' in df.columns:
-                df['time'] = pd.to_datetime(df['timestamp'], unit='s')
-                df['hour'] = df['time'].dt.hour
-                
                 # Engagement by hour
                 if 'engagement' in df.columns:
-                    hourly_engagement = df.groupby('hour')['engagement'].apply(
-                        lambda x: (x == 'Engaged').mean() * 100
-                    ).reset_index()
-                    
-                    fig = px.bar(hourly_engagement, x='hour', y='engagement',
-                               title='Engagement Rate by Hour',
-                               labels={'engagement': 'Engagement Rate (%)'})
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(_hourly_engagement_fig(*key, df), use_container_width=True)
             
             # Correlation analysis
             st.subheader("🔗 Pattern Analysis")
@@ -293,12 +343,12 @@ def main():
                 patterns = {}
                 
                 if 'context' in df.columns and 'engagement' in df.columns:
-                    context_engagement = pd.crosstab(df['context'], df['engagement'], normalize='index') * 100
+                    context_engagement = _engagement_crosstab(*key, df, 'context')
                     st.write("**Context vs Engagement (%)**")
                     st.dataframe(context_engagement)
                 
                 if 'emotion' in df.columns and 'engagement' in df.columns:
-                    emotion_engagement = pd.crosstab(df['emotion'], df['engagement'], normalize='index') * 100
+                    emotion_engagement = _engagement_crosstab(*key, df, 'emotion')
                     st.write("**Emotion vs Engagement (%)**")
                     st.dataframe(emotion_engagement)
         else:
@@ -314,18 +364,24 @@ def main():
             'sentiment': st.session_state.current_sentiment
         }
         
-        # Add to session data
-        st.session_state.session_data.append(current_data)
-        
-        # Update productivity score
-        st.session_state.productivity_score = get_productivity_score()
+        # Add to session data, once per update_interval; the components
+        # rerun the script more often than that when they get new results
+        if current_data['timestamp'] - st.session_state.last_record >= update_interval:
+            record_session_point(current_data)
+            st.session_state.last_record = current_data['timestamp']
+            
+            # Update productivity score
+            st.session_state.productivity_score = get_productivity_score()
         
         # Show status
         status_indicator.success("🟢 Monitoring Active - Data being collected")
         
-        # Auto-refresh
-        time.sleep(update_interval)
-        st.rerun()
+        # Auto-refresh: the browser triggers the next run after update_interval
+        if AUTOREFRESH_AVAILABLE:
+            st_autorefresh(interval=update_interval * 1000, key='main_refresh')
+        else:
+            time.sleep(update_interval)
+            st.rerun()
     else:
         status_indicator.info("🔴 Monitoring Inactive - Start audio or screen monitoring")
 
@@ -4,147 +4,318 @@ Test script for Streamlit Engagement Monitor
 This script validates that all components can be imported and basic functionality works
 """
 
+import os
 import sys
-import importlib
-from pathlib import Path
+import importlib.util
 
-def test_imports():
+# Project root, i.e. the directory of this script
+_HERE = os.path.dirname(__file__) or os.curdir
+
+# (category, module) for every dependency test_imports checks, grouped by category
+_MODULES = (
+    # Core dependencies
+    ("core", "streamlit"),
+    ("core", "pandas"),
+    ("core", "numpy"),
+    ("core", "plotly.graph_objects"),
+    ("core", "plotly.express"),
+    ("core", "time"),
+    ("core", "datetime"),
+    ("core", "pathlib"),
+    # Audio dependencies
+    ("audio", "pyaudio"),
+    ("audio", "librosa"),
+    ("audio", "joblib"),
+    ("audio", "sklearn"),
+    # Screen analysis dependencies
+    ("screen", "cv2"),
+    ("screen", "pytesseract"),
+    ("screen", "PIL"),
+    ("screen", "spacy"),
+    ("screen", "vaderSentiment"),
+)
+
+_SECTION_HEADINGS = {
+    "core": "Testing critical imports...",
+    "audio": "\nTesting audio dependencies...",
+    "screen": "\nTesting screen analysis dependencies...",
+}
+
+def _probe(module, deep=False):
+    """(module, ok, error) for one dependency; with deep, import it to be sure it loads
+    
+    Without deep only the module spec is resolved, so heavy packages (cv2,
+    librosa, spacy) are found without running their import-time code.
+    """
+    name = 'PIL.Image' if module == 'PIL' else module
+    # Already-loaded modules (pathlib, time, datetime, ...) need no lookup
+    if name in sys.modules:
+        return module, True, None
+    try:
+        if deep:
+            importlib.import_module(name)
+        elif importlib.util.find_spec(name) is None:
+            return module, False, f"No module named '{name}'"
+    except ImportError as e:
+        # find_spec raises when a parent package (e.g. plotly) is missing
+        return module, False, e
+    return module, True, None
+
+def _emit(lines):
+    """Write a section's lines to stdout in a single call"""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def test_imports(deep=False):
     """Test critical imports"""
-    print("Testing critical imports...")
+    # Imported here rather than at the top: concurrent.futures is the
+    # costliest import of this module, and only this check needs it
+    from concurrent.futures import ThreadPoolExecutor
     
-    # Core dependencies
-    modules_to_test = [
-        'streamlit',
-        'pandas', 
-        'numpy',
-        'plotly.graph_objects',
-        'plotly.express',
-        'time',
-        'datetime',
-        'pathlib'
-    ]
+    out = []
+    # Probe everything at once; the lookups are dominated by filesystem
+    # stats that release the GIL, so they overlap well across threads.
+    # Results come back in _MODULES order
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda entry: _probe(entry[1], deep), _MODULES))
     
     failed_imports = []
+    category = None
     
-    for module in modules_to_test:
-        try:
-            importlib.import_module(module)
-            print(f"✓ {module}")
-        except ImportError as e:
-            print(f"✗ {module}: {e}")
+    for (entry_category, _), (module, ok, error) in zip(_MODULES, results):
+        if entry_category != category:
+            category = entry_category
+            out.append(_SECTION_HEADINGS[category])
+        if ok:
+            out.append(f"✓ {module}")
+        else:
+            out.append(f"✗ {module}: {error}")
             failed_imports.append(module)
     
-    # Audio dependencies
-    print("\nTesting audio dependencies...")
-    audio_modules = ['pyaudio', 'librosa', 'joblib', 'sklearn']
-    
-    for module in audio_modules:
-        try:
-            importlib.import_module(module)
-            print(f"✓ {module}")
-        except ImportError as e:
-            print(f"✗ {module}: {e}")
-            failed_imports.append(module)
+    _emit(out)
+    return failed_imports
+
+_REQUIRED_FILES = (
+    'streamlit_app.py',
+    'requirements.txt',
+    'README.md',
+    'setup.ps1',
+    '.streamlit/config.toml',
+    'components/audio_monitor.py',
+    'components/screen_monitor.py',
+)
+
+_MODEL_FILES = (
+    'audio_engage/emotion_detection_model.joblib',
+)
+
+def _present(root, rel_paths):
+    """The subset of rel_paths (relative to root) that exist as regular files
     
-    # Screen analysis dependencies  
-    print("\nTesting screen analysis dependencies...")
-    screen_modules = ['cv2', 'pytesseract', 'PIL', 'spacy', 'vaderSentiment']
+    Each parent directory is listed once with os.scandir and the paths are
+    answered from that listing, instead of one stat per file. The file type
+    comes with the directory entry, so checking for a regular file costs no
+    further stat (except through symlinks).
+    """
+    by_dir = {}
+    for rel_path in rel_paths:
+        parent, name = os.path.split(rel_path)
+        by_dir.setdefault(parent, []).append((rel_path, name))
     
-    for module in screen_modules:
+    present = set()
+    for parent, entries in by_dir.items():
         try:
-            if module == 'PIL':
-                importlib.import_module('PIL.Image')
-            else:
-                importlib.import_module(module)
-            print(f"✓ {module}")
-        except ImportError as e:
-            print(f"✗ {module}: {e}")
-            failed_imports.append(module)
-    
-    return failed_imports
+            with os.scandir(os.path.join(root, parent)) as it:
+                names = {entry.name for entry in it if entry.is_file()}
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        present.update(rel_path for rel_path, name in entries if name in names)
+    return present
 
 def test_file_structure():
     """Test that required files exist"""
-    print("\nTesting file structure...")
-    
-    current_dir = Path(__file__).parent
-    
-    required_files = [
-        'streamlit_app.py',
-        'requirements.txt',
-        'README.md',
-        'setup.ps1',
-        '.streamlit/config.toml',
-        'components/audio_monitor.py',
-        'components/screen_monitor.py'
-    ]
+    out = ["\nTesting file structure..."]
     
     missing_files = []
+    present = _present(_HERE, _REQUIRED_FILES)
     
-    for file_path in required_files:
-        full_path = current_dir / file_path
-        if full_path.exists():
-            print(f"✓ {file_path}")
+    for file_path in _REQUIRED_FILES:
+        if file_path in present:
+            out.append(f"✓ {file_path}")
         else:
-            print(f"✗ {file_path}")
+            out.append(f"✗ {file_path}")
             missing_files.append(file_path)
     
+    _emit(out)
     return missing_files
 
 def test_model_files():
     """Test that model files exist"""
-    print("\nTesting model files...")
-    
-    current_dir = Path(__file__).parent
-    model_files = [
-        'audio_engage/emotion_detection_model.joblib'
-    ]
+    out = ["\nTesting model files..."]
     
     missing_models = []
+    present = _present(_HERE, _MODEL_FILES)
     
-    for model_path in model_files:
-        full_path = current_dir / model_path
-        if full_path.exists():
-            print(f"✓ {model_path}")
+    for model_path in _MODEL_FILES:
+        if model_path in present:
+            out.append(f"✓ {model_path}")
         else:
-            print(f"⚠ {model_path} (can be trained)")
+            out.append(f"⚠ {model_path} (can be trained)")
             missing_models.append(model_path)
     
+    _emit(out)
     return missing_models
 
-def test_components():
+# (module, label, class) for each component test_components imports
+_COMPONENTS = (
+    ("audio_monitor", "AudioProcessor", "StreamlitAudioProcessor"),
+    ("screen_monitor", "ScreenProcessor", "StreamlitScreenProcessor"),
+)
+
+# Modules each component imports unconditionally; everything else it needs
+# (pyaudio, librosa, cv2, spacy, ...) is optional and only disables features
+_COMPONENT_DEPS = {
+    "audio_monitor": {"streamlit", "numpy"},
+    "screen_monitor": {"streamlit", "numpy"},
+}
+
+def _load_component(name):
+    """Import components/<name>.py by path, leaving sys.path alone"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_HERE, "components", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+def test_components(failed_imports=()):
     """Test component imports"""
-    print("\nTesting component imports...")
+    out = ["\nTesting component imports..."]
     
-    # Add components to path
-    current_dir = Path(__file__).parent
-    components_path = current_dir / "components"
-    sys.path.append(str(components_path))
+    failed = set(failed_imports)
+    ok = True
+    
+    for name, label, class_name in _COMPONENTS:
+        # Importing the module is bound to fail without its hard dependencies
+        missing = _COMPONENT_DEPS[name] & failed
+        if missing:
+            out.append(f"✗ {label}: skipped, missing {', '.join(sorted(missing))}")
+            ok = False
+            break
+        
+        try:
+            getattr(_load_component(name), class_name)
+            out.append(f"✓ {label} can be imported")
+        except Exception as e:
+            out.append(f"✗ {label}: {e}")
+            ok = False
+            break
     
+    _emit(out)
+    return ok
+
+# Machine-readable results of the last run, for CI
+_REPORT = os.path.join(_HERE, ".test_setup_report.json")
+
+def _environment_hash(deep):
+    """Hash of the inputs the checks look at, to tell whether a rerun can be skipped
+    
+    Covers the interpreter, requirements.txt, this script, the name, size
+    and modification time of every file in the directories the file and
+    component checks read (including the shared screen-analyzer modules the
+    screen component imports), and the modification times of the import path
+    entries (site-packages changes whenever a package is installed or
+    removed). Edits that keep a file's size and mtime are not detected.
+    """
+    import hashlib
+    
+    h = hashlib.sha256(f"{sys.executable}\0{sys.version}\0{deep}".encode())
     try:
-        from audio_monitor import StreamlitAudioProcessor
-        print("✓ AudioProcessor can be imported")
-    except Exception as e:
-        print(f"✗ AudioProcessor: {e}")
-        return False
+        with open(os.path.join(_HERE, 'requirements.txt'), 'rb') as f:
+            h.update(f.read())
+    except OSError:
+        pass
+    try:
+        h.update(f"\0{__file__}:{os.stat(__file__).st_mtime_ns}".encode())
+    except OSError:
+        pass
+    
+    parents = {os.path.dirname(p) for p in _REQUIRED_FILES + _MODEL_FILES}
+    parents.add(os.path.join('screen-analyzer', 'shared'))
+    for parent in sorted(parents):
+        entries = []
+        try:
+            with os.scandir(os.path.join(_HERE, parent)) as it:
+                for e in it:
+                    if e.name == os.path.basename(_REPORT) or not e.is_file():
+                        # Subdirectories (e.g. __pycache__) change as a side
+                        # effect of running the checks
+                        continue
+                    st = e.stat()
+                    entries.append(f"{e.name}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            pass
+        h.update(f"\0{parent}:{'/'.join(sorted(entries))}".encode())
+    
+    here = os.path.realpath(_HERE)
+    for path in sys.path:
+        # The project directory itself is covered by the listings above, and
+        # its mtime changes whenever the report is first written
+        if os.path.realpath(path or os.curdir) == here:
+            continue
+        try:
+            h.update(f"\0{path}:{os.stat(path or os.curdir).st_mtime_ns}".encode())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+def _cached_ok(env_hash):
+    """Whether the last report passed in this same environment"""
+    import json
     
     try:
-        from screen_monitor import StreamlitScreenProcessor
-        print("✓ ScreenProcessor can be imported")
-    except Exception as e:
-        print(f"✗ ScreenProcessor: {e}")
+        with open(_REPORT, encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
         return False
+    return report.get('hash') == env_hash and report.get('passed') is True
+
+def _write_report(env_hash, **results):
+    import json
     
-    return True
+    report = dict(results, hash=env_hash)
+    try:
+        with open(_REPORT, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        _emit([f"\nCould not write {_REPORT}: {e}"])
 
 def main():
     """Run all tests"""
-    print("="*50)
-    print("STREAMLIT ENGAGEMENT MONITOR - VALIDATION TEST")
-    print("="*50)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Validate the Streamlit Engagement Monitor setup")
+    parser.add_argument('--deep', action='store_true',
+                        help="import every dependency instead of only locating it")
+    parser.add_argument('--cache', action='store_true',
+                        help="skip the checks if the last run passed and no checked file, "
+                             "package directory or the interpreter changed since; system "
+                             "libraries and binaries (tesseract, PortAudio) are not covered")
+    args = parser.parse_args()
+    
+    env_hash = _environment_hash(args.deep)
+    if args.cache and _cached_ok(env_hash):
+        _emit(["CACHED: OK (environment unchanged since the last passing run)"])
+        return
+    
+    _emit(["="*50, "STREAMLIT ENGAGEMENT MONITOR - VALIDATION TEST", "="*50])
     
     # Test imports
-    failed_imports = test_imports()
+    failed_imports = test_imports(deep=args.deep)
     
     # Test file structure
     missing_files = test_file_structure()
@@ -153,37 +324,44 @@ def main():
     missing_models = test_model_files()
     
     # Test components
-    components_ok = test_components()
+    components_ok = test_components(failed_imports)
+    
+    passed = not failed_imports and not missing_files and components_ok
+    _write_report(env_hash, passed=passed, failed_imports=failed_imports,
+                  missing_files=missing_files, missing_models=missing_models,
+                  components_ok=components_ok)
     
     # Summary
-    print("\n" + "="*50)
-    print("TEST SUMMARY")
-    print("="*50)
-    
-    if not failed_imports and not missing_files and components_ok:
-        print("✓ ALL TESTS PASSED!")
-        print("\nYou can run the application with:")
-        print("  streamlit run streamlit_app.py")
+    out = []
+    out.append("\n" + "="*50)
+    out.append("TEST SUMMARY")
+    out.append("="*50)
+    
+    if passed:
+        out.append("✓ ALL TESTS PASSED!")
+        out.append("\nYou can run the application with:")
+        out.append("  streamlit run streamlit_app.py")
     else:
-        print("⚠ SOME TESTS FAILED:")
+        out.append("⚠ SOME TESTS FAILED:")
         
         if failed_imports:
-            print(f"\nFailed imports: {', '.join(failed_imports)}")
-            print("Run: pip install -r requirements.txt")
+            out.append(f"\nFailed imports: {', '.join(failed_imports)}")
+            out.append("Run: pip install -r requirements.txt")
         
         if missing_files:
-            print(f"\nMissing files: {', '.join(missing_files)}")
-            print("Ensure all files are in the correct location")
+            out.append(f"\nMissing files: {', '.join(missing_files)}")
+            out.append("Ensure all files are in the correct location")
         
         if missing_models:
-            print(f"\nMissing models: {', '.join(missing_models)}")
-            print("Train the emotion model with: python audio_engage/train_emotion_model.py")
+            out.append(f"\nMissing models: {', '.join(missing_models)}")
+            out.append("Train the emotion model with: python audio_engage/train_emotion_model.py")
         
         if not components_ok:
-            print("\nComponent import failed")
-            print("Check component files and dependencies")
+            out.append("\nComponent import failed")
+            out.append("Check component files and dependencies")
     
-    print("\nFor detailed setup instructions, see README.md")
+    out.append("\nFor detailed setup instructions, see README.md")
+    _emit(out)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file